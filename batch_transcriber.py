@@ -0,0 +1,316 @@
+# batch_transcriber.py
+#
+# Non-interactive batch mode: VIDEO_FOLDER/AUDIO_FOLDER -> SRT files.
+#
+#   ffmpeg extraction (bounded pool)  ->  job queue (bounded)  ->  N transcription workers
+#
+# With stream=True the extraction stage is skipped: videos go straight into the
+# job queue and each worker pipes ffmpeg PCM into the model (no WAV on disk).
+#
+# The job queue is bounded, so extraction threads block once the transcription
+# workers fall behind (back-pressure) instead of filling the disk with WAVs.
+# Extracted WAVs go to a hidden work folder inside AUDIO_FOLDER (list_audios
+# doesn't look into subfolders) and are deleted once transcribed, so a re-run
+# neither transcribes them as audio inputs nor piles up new copies.
+# The transcription cache is checked against each video before extraction (the
+# key transcribe_media_to_srt uses), so cached videos cost no ffmpeg run at all.
+# Each worker process loads its own model once (model_pool) and gets an equal
+# share of the CPU cores through cpu_threads, so the box is saturated without
+# oversubscribing it.
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from subtitles_cli import (
+    AUDIO_FOLDER, MODEL_PATH, SUBTITLES_FOLDER, USE_TRANSCRIPTION_CACHE, VIDEO_EXTENSIONS, VIDEO_FOLDER,
+    list_audios, list_videos, media_cache_key, restore_cached_srt, transcribe_media_to_srt, transcribe_to_srt_cuda,
+)
+from transcription_cache import get_cache
+from media_utils import WHISPER_SAMPLE_RATE, extract_wav
+import pipeline_metrics
+
+DEFAULT_FFMPEG_JOBS = 2
+WORKER_POLL_SEC = 1.0  # how often worker processes are checked while waiting for results
+MAX_WORKER_RESTARTS = 8  # replacements for workers that died (OOM kill, segfault) before giving up
+
+
+def default_worker_count(cpu_count: int = None) -> int:
+    """One transcription worker per 4 cores is a good default for CTranslate2 on CPU."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, cpu_count // 4)
+
+
+def split_cpu_threads(workers: int, cpu_count: int = None) -> int:
+    """cpu_threads for each worker so that workers * cpu_threads <= cores."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, cpu_count // max(1, workers))
+
+
+def _transcription_worker(worker_id: int, job_queue, result_queue, subtitles_folder: str, options: dict):
+    """
+    Worker process: transcribe media paths from job_queue until a None sentinel.
+    Posts ("started", worker_id, path) before each job and ("done", worker_id, result) after it,
+    so the parent knows which job a worker that dies was holding.
+    """
+    while True:
+        audio_path = job_queue.get()
+        if audio_path is None:
+            break
+        result_queue.put(("started", worker_id, audio_path))
+        filename = os.path.splitext(os.path.basename(audio_path))[0]
+        # Videos only reach the queue in stream mode; they are decoded through an ffmpeg pipe.
+        transcribe = transcribe_media_to_srt if audio_path.lower().endswith(VIDEO_EXTENSIONS) else transcribe_to_srt_cuda
+        try:
+            output_srt = transcribe(
+                audio_path,
+                output_srt=os.path.join(subtitles_folder, filename + ".srt"),
+                **options
+            )
+            result_queue.put(("done", worker_id, (audio_path, output_srt, None)))
+        except Exception as e:
+            result_queue.put(("done", worker_id, (audio_path, None, str(e))))
+
+
+def run_batch(
+    video_folder: str = VIDEO_FOLDER,
+    audio_folder: str = AUDIO_FOLDER,
+    include_audios: bool = True,
+    subtitles_folder: str = SUBTITLES_FOLDER,
+    model_path: str = MODEL_PATH,
+    language: str = None,
+    device: str = "cpu",
+    compute_type: str = "int8",
+    workers: int = None,
+    cpu_threads: int = None,
+    ffmpeg_jobs: int = DEFAULT_FFMPEG_JOBS,
+    queue_size: int = None,
+    stream: bool = False,
+    batch_size: int = 0,
+) -> list:
+    """
+    Transcribe every video in video_folder (extracting audio to audio_folder first)
+    and, if include_audios, every WAV already present in audio_folder.
+
+    Returns:
+        list of (source_path, output_srt or None, error or None)
+    """
+    videos = list_videos(video_folder)
+    audios = list_audios(audio_folder) if include_audios else []
+    total = len(videos) + len(audios)
+    if not total:
+        print(f"⚠️ No media found in {video_folder} / {audio_folder}")
+        return []
+
+    workers = workers or default_worker_count()
+    cpu_threads = cpu_threads or split_cpu_threads(workers)
+    queue_size = queue_size or workers * 2
+
+    os.makedirs(subtitles_folder, exist_ok=True)
+    print(f"🚀 Batch: {len(videos)} videos + {len(audios)} WAVs | "
+          f"{workers} workers x {cpu_threads} threads | "
+          f"{'streaming audio' if stream else f'{ffmpeg_jobs} ffmpeg jobs'}")
+
+    ctx = mp.get_context("spawn")
+    job_queue = ctx.Queue(maxsize=queue_size)
+    result_queue = ctx.Queue()
+
+    options = {
+        "model_path": model_path,
+        "language": language,
+        "device": device,
+        "compute_type": compute_type,
+        "cpu_threads": cpu_threads,
+        "batch_size": batch_size,
+    }
+
+    def _spawn(worker_id):
+        process = ctx.Process(target=_transcription_worker,
+                              args=(worker_id, job_queue, result_queue, subtitles_folder, options), daemon=True)
+        process.start()
+        return process
+
+    processes = {worker_id: _spawn(worker_id) for worker_id in range(workers)}
+
+    work_folder = None
+    extracted = {}  # extracted WAV -> its video
+    video_cache_keys = {}  # extracted WAV -> cache key of its video
+    if videos and not stream:
+        os.makedirs(audio_folder, exist_ok=True)
+        work_folder = tempfile.mkdtemp(prefix=".batch_", dir=audio_folder)
+
+    def _extract_and_enqueue(video_path):
+        # Named after the video (no timestamp), so the SRT is too
+        filename = os.path.splitext(os.path.basename(video_path))[0]
+        cache_key = None
+        if USE_TRANSCRIPTION_CACHE:
+            try:
+                cache_key = media_cache_key(video_path, model_path, language, compute_type=compute_type,
+                                            batch_size=batch_size)
+            except OSError as e:
+                result_queue.put(("done", None, (video_path, None, f"cannot read video: {e}")))
+                return
+            output_srt = os.path.join(subtitles_folder, filename + ".srt")
+            if restore_cached_srt(cache_key, output_srt):  # nothing to extract or transcribe
+                result_queue.put(("done", None, (video_path, output_srt, None)))
+                return
+        wav_path = os.path.join(work_folder, filename + ".wav")
+        try:
+            extract_wav(video_path, wav_path, WHISPER_SAMPLE_RATE)
+        except Exception as e:
+            result_queue.put(("done", None, (video_path, None, f"audio extraction failed: {e}")))
+            return
+        extracted[wav_path] = video_path
+        if cache_key:
+            video_cache_keys[wav_path] = cache_key
+        queued.append(wav_path)
+        job_queue.put(wav_path)  # blocks while workers are busy -> back-pressure
+
+    def _produce():
+        for audio_path in audios:
+            queued.append(audio_path)
+            job_queue.put(audio_path)
+        if stream:
+            for video_path in videos:
+                queued.append(video_path)
+                job_queue.put(video_path)
+            return
+        with ThreadPoolExecutor(max_workers=ffmpeg_jobs) as pool:
+            list(pool.map(_extract_and_enqueue, videos))
+
+    queued = []  # every path handed to job_queue
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+
+    results = []
+    finished = set()  # job paths with a result
+    current = {}  # worker_id -> media path it is transcribing
+    restarts = 0
+    next_worker_id = workers
+    idle_polls = 0
+    completed = False
+
+    def _record(result):
+        source, output_srt, error = result
+        finished.add(source)
+        if source in extracted:  # report the video; its WAV is done with either way
+            os.remove(source)
+            cache_key = video_cache_keys.pop(source, None)
+            if cache_key and not error:  # the next run finds it before extracting
+                get_cache().put_file(cache_key, output_srt)
+            source = extracted.pop(source)
+            result = (source, output_srt, error)
+        results.append(result)
+        if error:
+            print(f"❌ [{len(results)}/{total}] {source}: {error}")
+        else:
+            print(f"✅ [{len(results)}/{total}] {output_srt}")
+
+    def _replace_dead_workers():
+        nonlocal restarts, next_worker_id
+        for worker_id, process in list(processes.items()):
+            if process.is_alive():
+                continue
+            del processes[worker_id]
+            source = current.pop(worker_id, None)
+            if source is not None:
+                _record((source, None, f"worker died (exit code {process.exitcode})"))
+            if restarts < MAX_WORKER_RESTARTS:
+                restarts += 1
+                processes[next_worker_id] = _spawn(next_worker_id)
+                next_worker_id += 1
+        if not processes:
+            raise RuntimeError(f"all transcription workers died, {total - len(results)} jobs not transcribed")
+
+    def _record_lost_jobs():
+        """A worker that died between taking a job and announcing it leaves no trace in current."""
+        for source in queued:
+            if source not in finished:
+                _record((source, None, "lost: its worker died before reporting it"))
+
+    try:
+        while len(results) < total:
+            try:
+                kind, worker_id, payload = result_queue.get(timeout=WORKER_POLL_SEC)
+            except queue.Empty:
+                _replace_dead_workers()  # a killed worker never posts its result
+                # Everything was queued and taken, nothing is running, yet results are missing. Two
+                # polls in a row, so the instant between taking a job and announcing it doesn't count.
+                idle = not producer.is_alive() and not current and job_queue.empty()
+                idle_polls = idle_polls + 1 if idle else 0
+                if idle_polls >= 2:
+                    _record_lost_jobs()
+                    break
+                continue
+            idle_polls = 0
+            if kind == "started":
+                current[worker_id] = payload
+            else:
+                current.pop(worker_id, None)
+                _record(payload)
+        completed = True
+    finally:
+        if completed:
+            producer.join()
+            for _ in processes:
+                job_queue.put(None)
+            for process in processes.values():
+                process.join()
+        else:  # the producer may be blocked on a full queue nobody reads any more
+            for process in processes.values():
+                process.terminate()
+        if work_folder:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    failed = sum(1 for _, _, error in results if error)
+    print(f"\n🏁 Batch finished: {total - failed} ok, {failed} failed")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch transcribe a folder of videos/WAVs to SRT.")
+    parser.add_argument("--video-folder", default=VIDEO_FOLDER)
+    parser.add_argument("--audio-folder", default=AUDIO_FOLDER)
+    parser.add_argument("--subtitles-folder", default=SUBTITLES_FOLDER)
+    parser.add_argument("--no-audios", action="store_true", help="do not transcribe WAVs already in audio folder")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--language", default=None, help="language code, autodetect if omitted")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cpu-threads", type=int, default=None, help="threads per worker")
+    parser.add_argument("--ffmpeg-jobs", type=int, default=DEFAULT_FFMPEG_JOBS)
+    parser.add_argument("--queue-size", type=int, default=None)
+    parser.add_argument("--stream", action="store_true", help="pipe ffmpeg PCM into workers, no WAV files")
+    parser.add_argument("--batch-size", type=int, default=0, help="batched decoding (BatchedInferencePipeline), 0 = sequential")
+    parser.add_argument("--metrics", default=None, help="write stage metrics (.jsonl or .prom)")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        pipeline_metrics.enable(args.metrics)
+
+    run_batch(
+        video_folder=args.video_folder,
+        audio_folder=args.audio_folder,
+        include_audios=not args.no_audios,
+        subtitles_folder=args.subtitles_folder,
+        model_path=args.model,
+        language=args.language,
+        device=args.device,
+        compute_type=args.compute_type,
+        workers=args.workers,
+        cpu_threads=args.cpu_threads,
+        ffmpeg_jobs=args.ffmpeg_jobs,
+        queue_size=args.queue_size,
+        stream=args.stream,
+        batch_size=args.batch_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
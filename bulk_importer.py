@@ -0,0 +1,287 @@
+# bulk_importer.py
+#
+# Headless bulk import: folder of SRT files -> database (+ local search index).
+#
+#   walk folder -> parse/hash/infer metadata (process pool) -> ordered DB writes
+#
+# - metadata comes from the file name, like the interactive prompts predict it:
+#   season/episode found -> series, otherwise a video title (--type music for songs)
+# - tables are initialized once per run, not per file
+# - idempotent: a ledger keyed by the file's content hash skips files that were
+#   already imported (renamed/moved copies included); files are hashed in a
+#   first pass (memoised by path + size + mtime) and only unknown ones are parsed
+# - the ledger row is committed right after each database save (WAL, cheap), so a
+#   crash never re-imports a saved file; the segment index (segment_index.py) is
+#   written in transactions of --batch-size files
+#
+# python bulk_importer.py ./subtitles --language en --workers 8
+
+import argparse
+import datetime
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from qc_runner import find_srt_files
+from segment_index import SegmentIndex, segment_rows
+from srt_parser import iter_srt
+from subtitles_rules import Subtitle
+from subtitles_cli import extract_season_episode_from_filename, extract_title_from_filename, media_basename_for_srt
+from database_api import initialize_subtitle_tables, save_srt_to_database  # importable once subtitles_cli set the path
+
+IMPORT_LEDGER_PATH = "./cache/import_ledger.sqlite"
+DEFAULT_BATCH_FILES = 500
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def infer_metadata(srt_path: str, subtitle_type: str = "auto", language: str = "en",
+                   extension: str = ".avi") -> dict:
+    """save_srt_to_database keyword arguments predicted from the file name."""
+    title = extract_title_from_filename(srt_path)
+    metadata = {
+        "video_title": None,
+        "season": None,
+        "episode": None,
+        "series": None,
+        "music_title": None,
+        "language": language,
+        "filename": media_basename_for_srt(srt_path) + extension,
+    }
+    if subtitle_type == "music":
+        metadata["music_title"] = title
+        return metadata
+
+    season, episode = extract_season_episode_from_filename(srt_path)
+    if subtitle_type == "serial" or (subtitle_type == "auto" and season and episode):
+        metadata["series"] = title
+        metadata["season"] = str(season).zfill(2) if season else None
+        metadata["episode"] = str(episode).zfill(2) if episode else None
+    else:
+        metadata["video_title"] = title
+    return metadata
+
+
+# ------------------ WORKER PROCESS ------------------
+
+def _hash_file(srt_path: str):
+    """Content hash of one file, None if it can't be read (_prepare_file reports the error)."""
+    try:
+        return file_hash(srt_path)
+    except OSError:
+        return None
+
+
+def _prepare_file(job) -> dict:
+    """Parse and infer metadata for one file, hashing it if the first pass couldn't (runs in a worker process)."""
+    srt_path, content_hash, subtitle_type, language, extension = job
+    try:
+        errors = []
+        cues = [(cue.index, cue.start, cue.end, cue.text) for cue in iter_srt(Path(srt_path), errors)]
+        return {
+            "path": srt_path,
+            "hash": content_hash or file_hash(srt_path),
+            "cues": cues,
+            "parse_errors": len(errors),
+            "metadata": infer_metadata(srt_path, subtitle_type, language, extension),
+            "error": None if cues else "no cues",
+        }
+    except Exception as e:
+        return {"path": srt_path, "error": f"{type(e).__name__}: {e}"}
+
+
+# ------------------ LEDGER ------------------
+
+class ImportLedger:
+    """
+    file content hash -> subtitle_id of every SRT already imported, plus the content
+    hash of every file seen (by path + size + mtime) so unchanged files aren't re-read.
+    """
+
+    def __init__(self, path: str = IMPORT_LEDGER_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS imported ("
+            "file_hash TEXT PRIMARY KEY, path TEXT, subtitle_id INTEGER, imported_at TEXT)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, file_hash TEXT)"
+        )
+        self.conn.commit()
+
+    def known_hashes(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT file_hash FROM imported")}
+
+    def file_hashes(self) -> dict:
+        """path -> (size, mtime_ns, content hash) as of the last time the file was hashed."""
+        return {row[0]: row[1:] for row in self.conn.execute("SELECT path, size, mtime_ns, file_hash FROM file_hashes")}
+
+    def remember_hashes(self, rows: list):
+        """rows: [(path, size, mtime_ns, content hash)]"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, file_hash) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def add(self, content_hash: str, path: str, subtitle_id: int):
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO imported (file_hash, path, subtitle_id, imported_at) VALUES (?, ?, ?, ?)",
+                (content_hash, path, subtitle_id, now)
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+# ------------------ MAIN ENTRY ------------------
+
+def bulk_import(folder: str, subtitle_type: str = "auto", language: str = "en", extension: str = ".avi",
+                workers: int = None, batch_size: int = DEFAULT_BATCH_FILES, ledger_path: str = IMPORT_LEDGER_PATH,
+                update_index: bool = True, dry_run: bool = False) -> dict:
+    """Import every SRT under folder that is not in the ledger yet. Returns counters."""
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+    srt_paths = find_srt_files(folder)
+    stats = {"found": len(srt_paths), "imported": 0, "skipped": 0, "failed": 0, "segments": 0}
+    if not srt_paths:
+        return stats
+
+    ledger = ImportLedger(ledger_path)
+    index = SegmentIndex() if update_index and not dry_run else None
+    known = ledger.known_hashes()
+    if not dry_run:
+        initialize_subtitle_tables()
+
+    index_batch = {}
+
+    def flush():
+        if index is not None and index_batch:
+            index.replace_subtitles(index_batch)
+            index_batch.clear()
+
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # First pass: content hashes, read only for new or changed files
+            hashes, to_hash = {}, []
+            remembered = ledger.file_hashes()
+            for path in srt_paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # _prepare_file reports it
+                entry = remembered.get(path)
+                if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                    hashes[path] = entry[2]
+                else:
+                    to_hash.append((path, stat.st_size, stat.st_mtime_ns))
+            fresh = []
+            for (path, size, mtime_ns), content_hash in zip(
+                    to_hash, pool.map(_hash_file, [path for path, _, _ in to_hash], chunksize=64)):
+                if content_hash is not None:
+                    hashes[path] = content_hash
+                    fresh.append((path, size, mtime_ns, content_hash))
+            if not dry_run:
+                ledger.remember_hashes(fresh)
+
+            pending = [path for path in srt_paths if hashes.get(path) not in known]
+            stats["skipped"] += len(srt_paths) - len(pending)
+            jobs = [(path, hashes.get(path), subtitle_type, language, extension) for path in pending]
+
+            # Parsing is parallel; database writes stay in this process, in folder order
+            for done, prepared in enumerate(pool.map(_prepare_file, jobs, chunksize=16), start=1):
+                if prepared["error"]:
+                    stats["failed"] += 1
+                    print(f"❌ {prepared['path']}: {prepared['error']}")
+                    continue
+                if prepared["hash"] in known:
+                    stats["skipped"] += 1
+                    continue
+
+                if dry_run:
+                    known.add(prepared["hash"])
+                    print(f"📝 {prepared['path']} -> {prepared['metadata']}")
+                    continue
+
+                metadata = prepared["metadata"]
+                try:
+                    subtitle_id = save_srt_to_database(srt_file_path=prepared["path"], **metadata)
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"❌ {prepared['path']}: {e}")
+                    continue
+                if not subtitle_id:
+                    stats["failed"] += 1
+                    print(f"❌ {prepared['path']}: not saved to database")
+                    continue
+
+                # Only a saved file makes later identical copies in this run skippable: after a
+                # failed save the next copy is tried instead
+                known.add(prepared["hash"])
+                stats["imported"] += 1
+                stats["segments"] += len(prepared["cues"])
+                ledger.add(prepared["hash"], prepared["path"], subtitle_id)
+                if index is not None:
+                    cues = (Subtitle(*cue) for cue in prepared["cues"])
+                    index_batch[subtitle_id] = segment_rows(subtitle_id, cues, **metadata)
+
+                if stats["imported"] % batch_size == 0:
+                    flush()
+                    print(f"📥 {done}/{len(pending)} new files | {stats['imported']} imported | "
+                          f"{time.perf_counter() - start:.0f}s")
+    finally:
+        flush()
+        ledger.close()
+        if index is not None:
+            index.close()
+
+    stats["elapsed_sec"] = round(time.perf_counter() - start, 1)
+    return stats
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a folder tree of SRT files into the subtitle database.")
+    parser.add_argument("folder")
+    parser.add_argument("--type", dest="subtitle_type", choices=("auto", "video", "serial", "music"), default="auto")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--extension", default=".avi", help="media file extension stored with each subtitle")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=_positive_int, default=DEFAULT_BATCH_FILES,
+                        help="files per search index transaction")
+    parser.add_argument("--ledger", default=IMPORT_LEDGER_PATH)
+    parser.add_argument("--no-index", action="store_true", help="don't update the local search index")
+    parser.add_argument("--dry-run", action="store_true", help="print inferred metadata, write nothing")
+    args = parser.parse_args(argv)
+
+    extension = args.extension if args.extension.startswith(".") else "." + args.extension
+    stats = bulk_import(args.folder, args.subtitle_type, args.language, extension, args.workers,
+                        args.batch_size, args.ledger, not args.no_index, args.dry_run)
+    print(f"✅ {stats}")
+
+
+if __name__ == "__main__":
+    main()
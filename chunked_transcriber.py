@@ -0,0 +1,224 @@
+# chunked_transcriber.py
+#
+# Long-audio mode: one multi-hour file transcribed by several processes.
+#
+#   decode once -> Silero VAD once -> cut at silences into ~N-minute chunks
+#   -> chunks transcribed in parallel (audio shared, not copied; each worker
+#   only decodes the chunk's speech, spans merged into clips of up to 30 s;
+#   VAD isn't run again) -> stitched
+#   back with global offsets -> usual post-processing + SRT writer
+#
+# Chunks end in silence, so segments never straddle a cut; the boundary
+# de-duplication only guards against Whisper repeating the last sentence.
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from batch_transcriber import default_worker_count, split_cpu_threads
+from media_utils import WHISPER_SAMPLE_RATE, decode_audio
+from model_pool import get_model
+from subtitles_cli import (
+    MODEL_PATH, RESEGMENT_RULES_PATH, SUBTITLES_FOLDER, WORD_TIMESTAMPS, load_resegment_rules, write_segments_to_srt
+)
+from subtitles_rules import Subtitle, WordTimings
+import pipeline_metrics
+
+DEFAULT_CHUNK_MINUTES = 10.0
+MIN_SILENCE_MS = 500  # silences shorter than this are never used as cut points
+MAX_CLIP_SEC = 30.0  # speech spans are merged into clips up to one Whisper window (gaps included)
+
+def plan_chunks(speech_timestamps: list, total_samples: int, chunk_samples: int) -> list:
+    """
+    Group VAD speech regions into chunks of at least chunk_samples, cutting in
+    the middle of the silence that follows. Returns [(start_sample, end_sample)].
+    """
+    if total_samples <= 0:
+        return []
+    if not speech_timestamps:
+        return [(0, total_samples)]
+
+    chunks = []
+    chunk_start = 0
+    for current, following in zip(speech_timestamps, speech_timestamps[1:]):
+        if current["end"] - chunk_start >= chunk_samples:
+            cut = (current["end"] + following["start"]) // 2
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+    chunks.append((chunk_start, total_samples))
+    return chunks
+
+
+def chunk_clip_timestamps(speech_timestamps: list, start_sample: int, end_sample: int,
+                          max_clip_sec: float = MAX_CLIP_SEC) -> list:
+    """
+    Speech regions inside [start_sample, end_sample) as faster-whisper clip_timestamps (chunk-relative
+    seconds). Neighbouring regions are merged into clips of up to max_clip_sec: every clip is padded to
+    a 30 s window and decoded on its own, so one clip per 2-6 s utterance would multiply encoder passes.
+    """
+    max_clip_samples = int(max_clip_sec * WHISPER_SAMPLE_RATE)
+    merged = []  # [start, end] in samples
+    for region in speech_timestamps:
+        start, end = max(region["start"], start_sample), min(region["end"], end_sample)
+        if start >= end:
+            continue
+        if merged and end - merged[-1][0] <= max_clip_samples:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    clips = []
+    for start, end in merged:
+        clips += [(start - start_sample) / WHISPER_SAMPLE_RATE, (end - start_sample) / WHISPER_SAMPLE_RATE]
+    return clips
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split()).strip(".,!?;:…")
+
+
+def stitch_chunks(chunk_results: list) -> list:
+    """Concatenate per-chunk segments (already globally timed), dropping a repeated boundary sentence."""
+    stitched = []
+    for segments in chunk_results:
+        if stitched and segments and _normalize_text(segments[0].text) == _normalize_text(stitched[-1].text):
+            segments = segments[1:]
+        stitched.extend(segments)
+    return stitched
+
+
+# ------------------ WORKER PROCESS ------------------
+
+_worker_state = {}
+
+
+def _init_worker(shm_name: str, total_samples: int, model_options: dict):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_state["shm"] = shm  # keep the mapping alive
+    _worker_state["audio"] = np.ndarray((total_samples,), dtype=np.float32, buffer=shm.buf)
+    _worker_state["model"] = get_model(**model_options)
+
+
+def _transcribe_chunk(job) -> list:
+    (start_sample, end_sample), clip_timestamps, transcribe_options = job
+    if not clip_timestamps:
+        return []  # no speech in this chunk
+    audio = _worker_state["audio"][start_sample:end_sample]
+    offset = start_sample / WHISPER_SAMPLE_RATE
+
+    segments, _ = _worker_state["model"].transcribe(audio, clip_timestamps=clip_timestamps, **transcribe_options)
+    return [
+        Subtitle(None, s.start + offset, s.end + offset, s.text,
+                 WordTimings.from_words(s.words, offset) if s.words else None)
+        for s in segments
+    ]
+
+
+# ------------------ MAIN ENTRY ------------------
+
+def transcribe_long_audio_to_srt(
+    media_path: str,
+    model_path: str = MODEL_PATH,
+    output_srt: str = None,
+    language: str = None,
+    translate: bool = False,
+    max_segment_duration: float = 10.0,
+    device: str = "cpu",
+    compute_type: str = "int8",
+    workers: int = None,
+    cpu_threads: int = None,
+    chunk_minutes: float = DEFAULT_CHUNK_MINUTES,
+    rules_path: str = RESEGMENT_RULES_PATH,
+    word_timestamps: bool = WORD_TIMESTAMPS,
+) -> str:
+    """Transcribe one long media file with VAD-aligned chunks across a process pool."""
+    if output_srt is None:
+        os.makedirs(SUBTITLES_FOLDER, exist_ok=True)
+        filename = os.path.splitext(os.path.basename(media_path))[0]
+        output_srt = os.path.join(SUBTITLES_FOLDER, filename + ".srt")
+
+    audio = decode_audio(media_path)
+    total_samples = len(audio)
+    with pipeline_metrics.stage("vad", audio_sec=total_samples / WHISPER_SAMPLE_RATE, source=media_path):
+        speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=MIN_SILENCE_MS))
+    chunks = plan_chunks(speech, total_samples, int(chunk_minutes * 60 * WHISPER_SAMPLE_RATE))
+
+    workers = max(1, min(workers or default_worker_count(), len(chunks)))
+    cpu_threads = cpu_threads or split_cpu_threads(workers)
+    print(f"🔪 {total_samples / WHISPER_SAMPLE_RATE:.0f}s audio -> {len(chunks)} chunks | "
+          f"{workers} workers x {cpu_threads} threads")
+
+    model_options = {
+        "model_path": model_path,
+        "device": device,
+        "compute_type": compute_type,
+        "cpu_threads": cpu_threads,
+    }
+    transcribe_options = {
+        "language": language,
+        "task": "translate" if translate else "transcribe",
+        "condition_on_previous_text": False,
+        "vad_filter": False,  # speech spans from the VAD pass above are passed as clip_timestamps
+        "word_timestamps": word_timestamps or rules_path is not None,
+    }
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+    try:
+        np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+        del audio  # workers read the shared copy
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(shm.name, total_samples, model_options),
+        ) as pool:
+            jobs = [(chunk, chunk_clip_timestamps(speech, *chunk), transcribe_options) for chunk in chunks]
+            chunk_results = list(pool.map(_transcribe_chunk, jobs))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    write_segments_to_srt(stitch_chunks(chunk_results), output_srt, max_segment_duration,
+                          rules=load_resegment_rules(rules_path))
+    return output_srt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe one long media file in parallel VAD-aligned chunks.")
+    parser.add_argument("media")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--language", default=None, help="language code, autodetect if omitted")
+    parser.add_argument("--translate", action="store_true")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cpu-threads", type=int, default=None, help="threads per worker")
+    parser.add_argument("--chunk-minutes", type=float, default=DEFAULT_CHUNK_MINUTES)
+    parser.add_argument("--metrics", default=None, help="write stage metrics (.jsonl or .prom)")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        pipeline_metrics.enable(args.metrics)
+
+    output_srt = transcribe_long_audio_to_srt(
+        args.media,
+        model_path=args.model,
+        output_srt=args.output,
+        language=args.language,
+        translate=args.translate,
+        device=args.device,
+        compute_type=args.compute_type,
+        workers=args.workers,
+        cpu_threads=args.cpu_threads,
+        chunk_minutes=args.chunk_minutes,
+    )
+    print(f"✅ Transcript saved: {output_srt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# clip_exporter.py
+#
+# Batch clip export: every hit of a text search (or a list of segment IDs) -> video clips.
+#
+#   segments -> matched to their source video -> grouped per video
+#            -> per video, one ffmpeg input per run of nearby clips, every clip an output
+#               (media_utils.extract_clips)
+#            -> worker pool across videos -> manifest.json (+ optional supercut)
+#
+# python clip_exporter.py --query "see you tomorrow" --output ./segments/see_you --supercut supercut.mp4
+# python clip_exporter.py --ids 12 48 977 --workers 4
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from media_utils import concat_clips, extract_clips
+from subtitles_cli import (
+    CLIP_EXTRACT_MODE, CLIP_MARGIN_SEC, VIDEO_SEGMENTS_FOLDER, convert_srt_time_to_seconds,
+    find_video_file_for_segment, segment_clip_filename,
+)
+from database_api import get_segment_by_id, search_segments_by_text  # importable once subtitles_cli set the path
+import pipeline_metrics
+
+DEFAULT_EXPORT_WORKERS = 2  # each ffmpeg run is multi-threaded already
+MANIFEST_NAME = "manifest.json"
+CLIP_EXTENSION = ".mkv"  # Matroska holds whatever codecs copy mode passes through
+
+
+def segments_for_query(query: str, phrase: bool = False) -> list:
+    """All segment rows matching query: local FTS index (built on first use), database if it can't be built."""
+    from segment_index import open_search_index
+
+    index = open_search_index()
+    if index is None:
+        return list(search_segments_by_text(query))
+    with index:
+        rows, page = [], 1
+        while True:
+            result = index.search(query, page=page, page_size=1000, phrase=phrase)
+            rows.extend(result.rows)
+            if not result.has_next:
+                return rows
+            page += 1
+
+
+def segments_for_ids(segment_ids: list) -> list:
+    rows = []
+    for segment_id in segment_ids:
+        row = get_segment_by_id(segment_id)
+        if row:
+            rows.append(row)
+        else:
+            print(f"⚠️ Segment {segment_id} not found")
+    return rows
+
+
+def plan_export(segments: list, output_folder: str, margin: float = CLIP_MARGIN_SEC):
+    """Group clips per source video. Returns ({video_path: [clip]}, [unmatched clip])."""
+    by_video, unmatched = defaultdict(list), []
+    for order, row in enumerate(segments):
+        segment_id, subtitle_id, time_start, time_end = row[0], row[1], row[2], row[3]
+        segment_number, text = row[5], row[4]
+        label = segment_id if segment_id is not None else f"{subtitle_id}-{segment_number}"
+        filename = f"{order:05d}_" + segment_clip_filename(row, label, CLIP_EXTENSION)
+        start = convert_srt_time_to_seconds(time_start)
+        end = convert_srt_time_to_seconds(time_end)
+        clip = {
+            "order": order,
+            "segment_id": segment_id,
+            "subtitle_id": subtitle_id,
+            "segment_number": segment_number,
+            "text": text,
+            "start": max(0.0, start - margin),
+            "end": end + margin,
+            "output": os.path.join(output_folder, filename),
+        }
+        video_path = find_video_file_for_segment(row)
+        if video_path:
+            clip["video"] = video_path
+            by_video[video_path].append(clip)
+        else:
+            clip["video"] = None
+            clip["error"] = "source video not found"
+            unmatched.append(clip)
+    return by_video, unmatched
+
+
+def _export_video(video_path: str, clips: list, mode: str, normalize: bool = False) -> list:
+    """Cut all clips of one video (sorted by time, so ffmpeg reads the file front to back)."""
+    clips = sorted(clips, key=lambda clip: clip["start"])
+    started = time.perf_counter()
+    try:
+        results = extract_clips(video_path, [(c["start"], c["end"], c["output"]) for c in clips], mode, normalize)
+        for clip, (clip_mode, error) in zip(clips, results):
+            clip["mode"] = clip_mode
+            clip["error"] = error
+    except Exception as e:  # before any clip was cut (probing the video)
+        for clip in clips:
+            clip["error"] = f"{type(e).__name__}: {e}"
+    elapsed = round(time.perf_counter() - started, 2)
+    for clip in clips:
+        clip["video_elapsed_sec"] = elapsed
+    return clips
+
+
+def export_clips(segments: list, output_folder: str, mode: str = CLIP_EXTRACT_MODE, workers: int = None,
+                 margin: float = CLIP_MARGIN_SEC, supercut: str = None) -> dict:
+    """Export one clip per segment row and write the manifest. Returns the manifest dict."""
+    os.makedirs(output_folder, exist_ok=True)
+    normalize = bool(supercut)  # one size/fps/audio layout for every source, so the clips join without re-encoding
+    if normalize:
+        mode = "accurate"
+
+    by_video, unmatched = plan_export(segments, output_folder, margin)
+    print(f"🎬 {len(segments)} segments -> {sum(len(c) for c in by_video.values())} clips "
+          f"from {len(by_video)} videos ({len(unmatched)} without video)")
+
+    started = time.perf_counter()
+    done = list(unmatched)
+    with ThreadPoolExecutor(max_workers=workers or DEFAULT_EXPORT_WORKERS) as pool:
+        futures = [pool.submit(_export_video, video, clips, mode, normalize) for video, clips in by_video.items()]
+        for future in futures:
+            done.extend(future.result())
+    done.sort(key=lambda clip: clip["order"])
+
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mode": mode,
+        "normalized": normalize,
+        "margin_sec": margin,
+        "elapsed_sec": round(time.perf_counter() - started, 2),
+        "clips": done,
+    }
+    exported = [clip["output"] for clip in done if not clip.get("error")]
+    if supercut and exported:
+        with pipeline_metrics.stage("supercut", clips=len(exported)):
+            manifest["supercut"] = concat_clips(exported, supercut)
+
+    with open(os.path.join(output_folder, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export video clips for search hits or segment IDs.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--query", help="export every segment matching this text")
+    source.add_argument("--ids", type=int, nargs="+", help="segment IDs to export")
+    parser.add_argument("--phrase", action="store_true", help="query words must appear as a phrase")
+    parser.add_argument("--output", default=None, help="clip folder (default: a new export_* folder in "
+                                                       f"{VIDEO_SEGMENTS_FOLDER})")
+    parser.add_argument("--mode", choices=("auto", "copy", "accurate"), default=CLIP_EXTRACT_MODE)
+    parser.add_argument("--margin", type=float, default=CLIP_MARGIN_SEC)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None, help="export at most this many segments")
+    parser.add_argument("--supercut", default=None, help="also join all clips into this file")
+    parser.add_argument("--metrics", default=None, help="write stage metrics here (.jsonl or .prom)")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        pipeline_metrics.enable(args.metrics)
+
+    segments = segments_for_query(args.query, args.phrase) if args.query else segments_for_ids(args.ids)
+    if args.limit:
+        segments = segments[:args.limit]
+    if not segments:
+        print("📭 No segments to export")
+        return
+
+    output = args.output or os.path.join(VIDEO_SEGMENTS_FOLDER, time.strftime("export_%Y%m%d_%H%M%S"))
+    manifest = export_clips(segments, output, args.mode, args.workers, args.margin, args.supercut)
+    failed = sum(1 for clip in manifest["clips"] if clip.get("error"))
+    print(f"✅ {len(manifest['clips']) - failed} clips, {failed} failed, {manifest['elapsed_sec']}s "
+          f"-> {os.path.join(output, MANIFEST_NAME)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# media_catalog.py
+#
+# Persistent catalog of the video files under a folder (recursive).
+#
+# find_video_file_for_segment used to list the video folder and re-run the
+# season/episode and title regexes on every file for every lookup. The catalog
+# parses each file name once and keeps lookup tables:
+#   - stored filename (no extension, case-insensitive)  -> path
+#   - (season, episode)                                 -> [(series, path)]
+#   - normalized title                                  -> [path]
+# Per file it also stores size/mtime and the container duration (ffprobe).
+#
+# Refresh is incremental: a folder whose mtime didn't change reuses its cached
+# listing (adding/removing/renaming an entry always bumps the folder mtime), and
+# a file whose size + mtime didn't change keeps its parsed entry, so only new or
+# modified files are parsed/probed.
+#
+# python media_catalog.py ./videos --episode "Some Show" 1 5
+# python media_catalog.py ./videos --list
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import pipeline_metrics
+from media_utils import media_duration
+from subtitles_cli import (
+    VIDEO_EXTENSIONS, VIDEO_FOLDER, extract_season_episode_from_filename, extract_title_from_filename,
+)
+
+MEDIA_CATALOG_FOLDER = "./cache/media_catalog"
+CATALOG_REFRESH_SEC = 5.0  # get_catalog() re-checks the folder at most this often
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalize_name(text) -> str:
+    """Lower-case words separated by single spaces: 'The_Show - ' -> 'the show'."""
+    return _NON_ALNUM.sub(" ", str(text).lower()).strip()
+
+
+def _as_number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MediaCatalog:
+    def __init__(self, root: str = VIDEO_FOLDER, cache_folder: str = MEDIA_CATALOG_FOLDER,
+                 extensions: tuple = VIDEO_EXTENSIONS, probe_durations: bool = True):
+        self.root = root
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.probe_durations = probe_durations
+        key = hashlib.blake2b(os.path.abspath(root).encode(), digest_size=8).hexdigest()
+        self.path = os.path.join(cache_folder, key + ".json")
+        self.dirs = {}   # folder -> {"mtime_ns", "files", "subdirs"}
+        self.files = {}  # path -> {"size", "mtime_ns", "title", "season", "episode", "duration"}
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.dirs, self.files = data.get("dirs", {}), data.get("files", {})
+        self._build_lookups()
+
+    def __len__(self):
+        return len(self.files)
+
+    # ------------------ REFRESH ------------------
+
+    def _list_folder(self, folder: str, stats: dict):
+        """(video file names, subfolder names) of folder, from the cache while its mtime is unchanged."""
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError:
+            return [], []
+        cached = self.dirs.get(folder)
+        if cached and cached["mtime_ns"] == mtime_ns:
+            return cached["files"], cached["subdirs"]
+
+        files, subdirs = [], []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.name.lower().endswith(self.extensions):
+                    files.append(entry.name)
+        files.sort()
+        subdirs.sort()
+        self.dirs[folder] = {"mtime_ns": mtime_ns, "files": files, "subdirs": subdirs}
+        stats["dirs_scanned"] += 1
+        return files, subdirs
+
+    def _entry(self, path: str, stat) -> dict:
+        season, episode = extract_season_episode_from_filename(path)
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "title": extract_title_from_filename(path),
+            "season": season,
+            "episode": episode,
+            "duration": media_duration(path) if self.probe_durations else None,
+        }
+
+    def refresh(self) -> dict:
+        """Bring the catalog up to date with the folder tree. Returns counters."""
+        stats = {"dirs_scanned": 0, "added": 0, "updated": 0, "removed": 0}
+        with pipeline_metrics.stage("media_catalog_refresh", source=self.root):
+            seen_dirs, seen_files = set(), set()
+            pending = [self.root]
+            while pending:
+                folder = pending.pop()
+                seen_dirs.add(folder)
+                files, subdirs = self._list_folder(folder, stats)
+                pending.extend(os.path.join(folder, name) for name in reversed(subdirs))
+
+                for name in files:
+                    path = os.path.join(folder, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    seen_files.add(path)
+                    entry = self.files.get(path)
+                    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                        continue
+                    stats["updated" if entry else "added"] += 1
+                    self.files[path] = self._entry(path, stat)
+
+            for folder in set(self.dirs) - seen_dirs:
+                del self.dirs[folder]
+            for path in set(self.files) - seen_files:
+                del self.files[path]
+                stats["removed"] += 1
+
+        if stats["dirs_scanned"] or stats["added"] or stats["updated"] or stats["removed"]:
+            self._build_lookups()
+            self.save()
+        return stats
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"root": self.root, "dirs": self.dirs, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    # ------------------ LOOKUPS ------------------
+
+    def _build_lookups(self):
+        self._by_filename, self._by_episode, self._by_title = {}, {}, {}
+        for path in sorted(self.files):  # first path wins on duplicate names
+            entry = self.files[path]
+            stem = os.path.splitext(os.path.basename(path))[0].lower()
+            self._by_filename.setdefault(stem, path)
+            title = normalize_name(entry["title"]) if entry["title"] else ""
+            if entry["season"] is not None and entry["episode"] is not None:
+                self._by_episode.setdefault((entry["season"], entry["episode"]), []).append((title, path))
+            if title:
+                self._by_title.setdefault(title, []).append(path)
+
+    def find_by_filename(self, filename: str):
+        """Video whose name (extension ignored, case-insensitive) matches a stored media filename."""
+        stem = os.path.splitext(os.path.basename(filename))[0].lower()
+        return self._by_filename.get(stem) if stem else None
+
+    def find_episode(self, series: str, season, episode):
+        """Video of series SxE: exact series title first, else one whose title contains the series name."""
+        candidates = self._by_episode.get((_as_number(season), _as_number(episode)), [])
+        series = normalize_name(series)
+        if not series:
+            return None
+        for title, path in candidates:
+            if title == series:
+                return path
+        for title, path in candidates:
+            if series in title:
+                return path
+        return None
+
+    def find_by_title(self, video_title: str):
+        """Video titled video_title; falls back to a title containing it (scans titles only on a miss)."""
+        video_title = normalize_name(video_title)
+        if not video_title:
+            return None
+        paths = self._by_title.get(video_title)
+        if paths:
+            return paths[0]
+        for title, paths in self._by_title.items():
+            if video_title in title:
+                return paths[0]
+        return None
+
+    def videos(self) -> list:
+        return sorted(self.files)
+
+    def entry(self, path: str):
+        return self.files.get(path)
+
+
+_catalogs = {}  # root -> (catalog, last refresh time)
+
+
+def get_catalog(root: str = VIDEO_FOLDER) -> MediaCatalog:
+    """Process-wide catalog of root, refreshed when older than CATALOG_REFRESH_SEC."""
+    catalog, refreshed = _catalogs.get(root, (None, 0.0))
+    if catalog is None:
+        catalog = MediaCatalog(root)
+    now = time.monotonic()
+    if now - refreshed >= CATALOG_REFRESH_SEC:
+        catalog.refresh()
+        _catalogs[root] = (catalog, now)
+    return catalog
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build/refresh the video catalog and look files up in it.")
+    parser.add_argument("folder", nargs="?", default=VIDEO_FOLDER)
+    parser.add_argument("--no-durations", action="store_true", help="don't probe durations of new files")
+    parser.add_argument("--filename", default=None, help="look up a stored media filename")
+    parser.add_argument("--episode", nargs=3, metavar=("SERIES", "SEASON", "EPISODE"), default=None)
+    parser.add_argument("--title", default=None, help="look up a video title")
+    parser.add_argument("--list", action="store_true", help="print every cataloged video")
+    parser.add_argument("--metrics", default=None, help="write stage metrics here (.jsonl or .prom)")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        pipeline_metrics.enable(args.metrics)
+
+    catalog = MediaCatalog(args.folder, probe_durations=not args.no_durations)
+    stats = catalog.refresh()
+    print(f"📚 {len(catalog)} videos in {args.folder} {stats}")
+
+    if args.list:
+        for path in catalog.videos():
+            entry = catalog.entry(path)
+            episode = f" S{entry['season']:02}E{entry['episode']:02}" if entry["season"] is not None else ""
+            duration = f" {entry['duration']:.0f}s" if entry["duration"] else ""
+            print(f"  {path}  [{entry['title']}{episode}{duration}]")
+    lookups = []
+    if args.filename:
+        lookups.append((f"filename {args.filename!r}", catalog.find_by_filename(args.filename)))
+    if args.episode:
+        lookups.append((f"episode {args.episode}", catalog.find_episode(*args.episode)))
+    if args.title:
+        lookups.append((f"title {args.title!r}", catalog.find_by_title(args.title)))
+    for label, path in lookups:
+        print(f"{'✅' if path else '❌'} {label} -> {path}")
+
+
+if __name__ == "__main__":
+    main()
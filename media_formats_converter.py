@@ -1,6 +1,8 @@
 import os
 import subprocess
 
+from media_utils import WHISPER_SAMPLE_RATE, extract_wav, is_whisper_wav, run_ffmpeg
+
 
 def wav_to_black_background_mp4(audio_file, output_file="output.mp4", width=640, height=360):
     if not os.path.isfile(audio_file):
@@ -8,7 +10,7 @@ def wav_to_black_background_mp4(audio_file, output_file="output.mp4", width=640,
         return
 
     cmd = [
-        "ffmpeg",
+        "ffmpeg", "-y",
         "-f", "lavfi",
         "-i", f"color=c=black:s={width}x{height}",
         "-i", audio_file,
@@ -20,7 +22,7 @@ def wav_to_black_background_mp4(audio_file, output_file="output.mp4", width=640,
     ]
 
     try:
-        subprocess.run(cmd, check=True)
+        run_ffmpeg(cmd)
         print(f"MP4 video created: {output_file}")
     except subprocess.CalledProcessError as e:
         print("Error during conversion:", e)
@@ -38,17 +40,14 @@ def mp3_to_std_wav(mp3_file):
     base, _ = os.path.splitext(mp3_file)
     wav_file = base + ".wav"
 
-    cmd = [
-        "ffmpeg",
-        "-i", mp3_file,
-        "-ar", 16000,  # 16kHz sample rate (Whisper default)
-        "-ac", "1",  # mono channel
-        "-c:a", "pcm_s16le",  # 16-bit PCM
-        wav_file
-    ]
+    # already converted (re-runs over a prepared library skip ffmpeg)
+    if (os.path.isfile(wav_file) and is_whisper_wav(wav_file)
+            and os.path.getmtime(wav_file) >= os.path.getmtime(mp3_file)):
+        print(f"WAV file up to date: {wav_file}")
+        return wav_file
 
     try:
-        subprocess.run(cmd, check=True)
+        extract_wav(mp3_file, wav_file, WHISPER_SAMPLE_RATE)  # 16kHz mono 16-bit PCM (Whisper default)
         print(f"WAV file created: {wav_file}")
         return wav_file
     except subprocess.CalledProcessError as e:
@@ -1,3 +1,758 @@
 # using ffmpeg
 # media_utils should have all manipulation of ffmpeg
-# media_formats_converter.py and part of subtitles_cli.py should be JUST here
\ No newline at end of file
+# media_formats_converter.py and part of subtitles_cli.py should be JUST here
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import math
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import wave
+from collections import deque
+
+import numpy as np
+
+import pipeline_metrics
+
+WHISPER_SAMPLE_RATE = 16000
+PCM_READ_SIZE = 1 << 20  # bytes per stdout read (~32 s of 16 kHz mono s16le)
+
+
+def _pcm_command(media_path: str, sample_rate: int = WHISPER_SAMPLE_RATE, start: float = None) -> list:
+    """ffmpeg command that decodes any media to raw mono s16le PCM on stdout."""
+    # -ss before -i seeks in the input instead of decoding up to the offset
+    seek = ["-ss", f"{start:.3f}"] if start else []
+    return [
+        "ffmpeg", "-nostdin",
+        "-v", "error",
+        *seek,
+        "-i", media_path,
+        "-vn",
+        "-f", "s16le",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "-ac", "1",
+        "-"
+    ]
+
+
+def pcm_s16le_to_float32(raw: bytes) -> np.ndarray:
+    """Convert raw s16le bytes to the float32 [-1, 1] array WhisperModel.transcribe expects."""
+    raw = memoryview(raw)[:len(raw) - len(raw) % 2]
+    audio = np.frombuffer(raw, dtype=np.int16).astype(np.float32)
+    audio *= 1.0 / 32768.0
+    return audio
+
+
+def write_wav(wav_path: str, raw: bytes, sample_rate: int = WHISPER_SAMPLE_RATE) -> str:
+    """Persist raw mono s16le PCM as a WAV file."""
+    with wave.open(wav_path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(raw)
+    return wav_path
+
+
+def read_wav_format(wav_path: str):
+    """
+    {"format_tag", "channels", "sample_rate", "bits", "data_offset", "data_bytes"}
+    from the RIFF header of a WAV file (chunks walked, samples not read); None if it isn't one.
+    """
+    try:
+        with open(wav_path, "rb") as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+                return None
+            wav_format = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, size = header[:4], struct.unpack("<I", header[4:])[0]
+                if chunk_id == b"fmt ":
+                    fmt = f.read(size + size % 2)
+                    if len(fmt) < 16:
+                        return None
+                    format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                    if format_tag == 0xFFFE and len(fmt) >= 26:  # WAVE_FORMAT_EXTENSIBLE: sub-format GUID
+                        format_tag = struct.unpack("<H", fmt[24:26])[0]
+                    wav_format = {"format_tag": format_tag, "channels": channels, "sample_rate": sample_rate,
+                                  "bits": bits}
+                elif chunk_id == b"data":
+                    if wav_format is None:
+                        return None
+                    available = os.fstat(f.fileno()).st_size - f.tell()
+                    if size in (0, 0xFFFFFFFF) or size > available:  # streamed/truncated WAVs
+                        size = available
+                    wav_format["data_offset"] = f.tell()
+                    wav_format["data_bytes"] = size - size % 2
+                    return wav_format
+                else:
+                    f.seek(size + size % 2, os.SEEK_CUR)
+    except OSError:
+        return None
+
+
+def _whisper_wav_format(media_path: str, sample_rate: int = WHISPER_SAMPLE_RATE):
+    wav_format = read_wav_format(media_path)
+    if (wav_format and wav_format["format_tag"] == 1 and wav_format["channels"] == 1
+            and wav_format["bits"] == 16 and wav_format["sample_rate"] == sample_rate):
+        return wav_format
+    return None
+
+
+def is_whisper_wav(media_path: str, sample_rate: int = WHISPER_SAMPLE_RATE) -> bool:
+    """True for a mono s16le PCM WAV at sample_rate: usable without ffmpeg/resampling."""
+    return _whisper_wav_format(media_path, sample_rate) is not None
+
+
+def load_whisper_wav(wav_path: str, sample_rate: int = WHISPER_SAMPLE_RATE, start: float = None):
+    """
+    float32 audio of a mono s16le WAV at sample_rate, read through a memory map
+    (the only copy is the float32 conversion). None if the file isn't one.
+    """
+    wav_format = _whisper_wav_format(wav_path, sample_rate)
+    if wav_format is None:
+        return None
+    samples = wav_format["data_bytes"] // 2
+    first = min(int(round(start * sample_rate)), samples) if start else 0
+    if first == samples:
+        return np.zeros(0, dtype=np.float32)
+    pcm = np.memmap(wav_path, dtype="<i2", mode="r", offset=wav_format["data_offset"] + first * 2,
+                    shape=(samples - first,))
+    return np.multiply(pcm, 1.0 / 32768.0, dtype=np.float32)
+
+
+def decode_audio(media_path: str, sample_rate: int = WHISPER_SAMPLE_RATE, save_wav: str = None,
+                 start: float = None) -> np.ndarray:
+    """
+    Decode media straight from ffmpeg stdout into a float32 mono array,
+    without an intermediate WAV on disk.
+
+    Args:
+        save_wav: optional path; the decoded PCM is also persisted there as WAV.
+        start: optional offset in seconds; decoding starts there.
+    """
+    if save_wav is None and _whisper_wav_format(media_path, sample_rate) is not None:
+        # Already mono s16le at sample_rate: no ffmpeg decode / resample needed
+        with pipeline_metrics.stage("wav_mmap", source=media_path) as metrics:
+            audio = load_whisper_wav(media_path, sample_rate, start)
+            metrics["audio_sec"] = len(audio) / sample_rate
+        return audio
+
+    with pipeline_metrics.stage("ffmpeg_decode", source=media_path) as metrics:
+        raw = asyncio.run(read_ffmpeg_stdout_async(_pcm_command(media_path, sample_rate, start)))
+        if save_wav:
+            write_wav(save_wav, raw, sample_rate)
+        audio = pcm_s16le_to_float32(raw)
+        metrics["audio_sec"] = len(audio) / sample_rate
+    return audio
+
+
+# ------------------ FFMPEG JOBS ------------------
+#
+# ffmpeg/ffprobe run as asyncio subprocesses:
+#   - at most FFMPEG_CONCURRENCY at once in the whole process, whatever thread or
+#     event loop starts them (a caller's semaphore can only lower that)
+#   - stderr is drained as it comes and only its last lines are kept for errors
+#   - with on_progress, ffmpeg reports through -progress pipe:1 and the callback
+#     gets (seconds done, fraction of the expected duration or None)
+#   - cancelling the task kills the process
+# probe_media() caches format/stream metadata on disk by path + size + mtime.
+# The sync wrappers (run_ffmpeg, probe_media, probe_video, extract_wav, extract_wavs,
+# decode_audio) are what the tools call; each runs its own event loop.
+
+FFMPEG_CONCURRENCY = max(1, (os.cpu_count() or 2) // 2)
+MEDIA_PROBE_CACHE_FOLDER = "./cache/probes"
+STDERR_TAIL_LINES = 40
+SLOT_POLL_SEC = 0.05  # how often a task waiting for a process-wide ffmpeg slot retries
+
+_MEDIA_PROBE_COMMAND = [
+    "ffprobe", "-v", "error",
+    "-show_entries", "format=duration,format_name"
+                     ":stream=index,codec_type,codec_name,profile,pix_fmt,width,height,sample_rate,channels",
+    "-of", "json",
+]
+
+_probes = {}  # cache file -> probe, in front of the on-disk probe caches
+_process_slots = threading.BoundedSemaphore(FFMPEG_CONCURRENCY)  # shared by every thread and event loop
+
+
+@contextlib.asynccontextmanager
+async def _ffmpeg_slot(slots: asyncio.Semaphore = None):
+    """Hold one ffmpeg/ffprobe slot: the caller's semaphore (if any), then one of the process-wide ones."""
+    async with slots or contextlib.nullcontext():
+        # Polled rather than awaited in a thread: a cancelled task can't leave a slot acquired
+        while not _process_slots.acquire(blocking=False):
+            await asyncio.sleep(SLOT_POLL_SEC)
+        try:
+            yield
+        finally:
+            _process_slots.release()
+
+
+def _probe_cache_path(media_path: str, cache_folder: str) -> str:
+    stat = os.stat(media_path)
+    key = hashlib.blake2b(
+        f"{os.path.abspath(media_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode(), digest_size=16
+    ).hexdigest()
+    return os.path.join(cache_folder, key + ".json")
+
+
+def _load_probe(cache_path: str):
+    probe = _probes.get(cache_path)
+    if probe is None and os.path.isfile(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            probe = _probes[cache_path] = json.load(f)
+    return probe
+
+
+def _store_probe(cache_path: str, probe: dict):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(probe, f)
+    os.replace(tmp_path, cache_path)
+    _probes[cache_path] = probe
+
+
+async def _kill_on_cancel(process, awaitable):
+    try:
+        return await awaitable
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        raise
+
+
+async def _drain_stderr(stream, tail: deque):
+    async for line in stream:
+        tail.append(line.decode(errors="replace").rstrip())
+
+
+async def _read_progress(stream, duration, on_progress):
+    seconds = 0.0
+    async for line in stream:
+        key, _, value = line.decode(errors="replace").strip().partition("=")
+        if key in ("out_time_us", "out_time_ms") and value.isdigit():  # both are microseconds
+            seconds = int(value) / 1e6
+        elif key == "progress":  # ends every progress block
+            fraction = min(1.0, seconds / duration) if duration else None
+            on_progress(seconds, 1.0 if value == "end" else fraction)
+
+
+async def run_ffmpeg_async(command: list, duration: float = None, on_progress=None,
+                           slots: asyncio.Semaphore = None):
+    """
+    Run an ffmpeg command (argv list starting with "ffmpeg"). The command must
+    not write media to stdout when on_progress is given (stdout carries the
+    progress reports). Returns the last stderr lines; raises CalledProcessError
+    with them on failure.
+    """
+    if on_progress:
+        command = [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+    async with _ffmpeg_slot(slots):
+        process = await asyncio.create_subprocess_exec(
+            *command, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE if on_progress else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        tail = deque(maxlen=STDERR_TAIL_LINES)
+        readers = [_drain_stderr(process.stderr, tail)]
+        if on_progress:
+            readers.append(_read_progress(process.stdout, duration, on_progress))
+        await _kill_on_cancel(process, asyncio.gather(*readers))
+        returncode = await _kill_on_cancel(process, process.wait())
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, stderr="\n".join(tail))
+    return list(tail)
+
+
+def run_ffmpeg(command: list, duration: float = None, on_progress=None) -> list:
+    return asyncio.run(run_ffmpeg_async(command, duration, on_progress))
+
+
+async def _read_stdout(stream, chunks: list):
+    while True:
+        chunk = await stream.read(PCM_READ_SIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+
+
+async def read_ffmpeg_stdout_async(command: list, slots: asyncio.Semaphore = None) -> bytes:
+    """Run an ffmpeg command that writes to stdout ("-") and return what it wrote."""
+    async with _ffmpeg_slot(slots):
+        process = await asyncio.create_subprocess_exec(
+            *command, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        chunks, tail = [], deque(maxlen=STDERR_TAIL_LINES)
+        await _kill_on_cancel(process, asyncio.gather(_read_stdout(process.stdout, chunks),
+                                                      _drain_stderr(process.stderr, tail)))
+        returncode = await _kill_on_cancel(process, process.wait())
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, stderr="\n".join(tail))
+    return b"".join(chunks)
+
+
+async def _gather_limited(make_job, items, concurrency: int) -> list:
+    slots = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(make_job(item, slots) for item in items), return_exceptions=True)
+
+
+def run_ffmpeg_jobs(commands: list, concurrency: int = FFMPEG_CONCURRENCY) -> list:
+    """Run many ffmpeg commands, at most concurrency at once. Returns the stderr tail or the exception per command."""
+    return asyncio.run(_gather_limited(
+        lambda command, slots: run_ffmpeg_async(command, slots=slots), commands, concurrency
+    ))
+
+
+def _parse_media_probe(output: str) -> dict:
+    data = json.loads(output)
+    streams = []
+    for stream in data.get("streams", []):
+        stream = dict(stream)
+        if "sample_rate" in stream:
+            stream["sample_rate"] = int(stream["sample_rate"])
+        streams.append(stream)
+    duration = data.get("format", {}).get("duration")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "format_name": data.get("format", {}).get("format_name"),
+        "streams": streams,
+    }
+
+
+async def probe_media_async(media_path: str, cache_folder: str = MEDIA_PROBE_CACHE_FOLDER,
+                            slots: asyncio.Semaphore = None) -> dict:
+    """
+    {"duration", "format_name", "streams": [{index, codec_type, codec_name, ...}]},
+    cached on disk by path + size + mtime (keyframes: see probe_video).
+    """
+    cache_path = _probe_cache_path(media_path, cache_folder)
+    probe = _load_probe(cache_path)
+    if probe is None:
+        async with _ffmpeg_slot(slots):
+            process = await asyncio.create_subprocess_exec(
+                *_MEDIA_PROBE_COMMAND, media_path, stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await _kill_on_cancel(process, process.communicate())
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, _MEDIA_PROBE_COMMAND + [media_path],
+                                                stderr=stderr.decode(errors="replace"))
+        probe = _parse_media_probe(stdout.decode(errors="replace"))
+        _store_probe(cache_path, probe)
+    return probe
+
+
+def probe_media(media_path: str, cache_folder: str = MEDIA_PROBE_CACHE_FOLDER) -> dict:
+    probe = _load_probe(_probe_cache_path(media_path, cache_folder))
+    return probe if probe is not None else asyncio.run(probe_media_async(media_path, cache_folder))
+
+
+def media_duration(media_path: str):
+    """Container duration in seconds (cached ffprobe, no decoding), None if it can't be read."""
+    try:
+        duration = probe_media(media_path)["duration"]
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+    return round(duration, 3) if duration is not None else None
+
+
+def _wav_command(media_path: str, output_wav: str, sample_rate: int) -> list:
+    return [
+        "ffmpeg", "-y", "-v", "error",
+        "-i", media_path,
+        "-vn",
+        "-acodec", "pcm_s16le",  # WAV PCM 16-bit
+        "-ar", str(sample_rate),
+        "-ac", "1",              # mono
+        output_wav
+    ]
+
+
+async def extract_wav_async(media_path: str, output_wav: str, sample_rate: int = WHISPER_SAMPLE_RATE,
+                            on_progress=None, slots: asyncio.Semaphore = None) -> str:
+    """
+    Decode any media to a mono s16le WAV; a failed or cancelled run leaves no partial file.
+    A source that already is such a WAV is copied instead of re-encoded.
+    """
+    if is_whisper_wav(media_path, sample_rate):
+        if os.path.abspath(media_path) != os.path.abspath(output_wav):
+            shutil.copyfile(media_path, output_wav)
+        return output_wav
+
+    duration = None
+    if on_progress:
+        try:
+            duration = (await probe_media_async(media_path, slots=slots))["duration"]
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            pass  # progress without a percentage
+    try:
+        with pipeline_metrics.stage("ffmpeg_extract", source=media_path):
+            await run_ffmpeg_async(_wav_command(media_path, output_wav, sample_rate), duration, on_progress,
+                                   slots)
+    except BaseException:
+        if os.path.exists(output_wav):
+            os.remove(output_wav)
+        raise
+    return output_wav
+
+
+def extract_wav(media_path: str, output_wav: str, sample_rate: int = WHISPER_SAMPLE_RATE,
+                on_progress=None) -> str:
+    return asyncio.run(extract_wav_async(media_path, output_wav, sample_rate, on_progress))
+
+
+def extract_wavs(jobs: list, sample_rate: int = WHISPER_SAMPLE_RATE, concurrency: int = FFMPEG_CONCURRENCY) -> list:
+    """jobs: [(media_path, output_wav)], at most concurrency at once. Returns the WAV path or exception per job."""
+    return asyncio.run(_gather_limited(
+        lambda job, slots: extract_wav_async(job[0], job[1], sample_rate, slots=slots), jobs, concurrency
+    ))
+
+
+# ------------------ VIDEO CLIPS ------------------
+#
+# extract_clip() modes:
+#   copy      stream copy from the keyframe at/before start (start must be on a keyframe to be exact)
+#   smart     re-encode only the partial GOPs at both edges, stream copy everything in between;
+#             the result is decode-checked and redone as accurate if the parts don't join cleanly
+#   accurate  full re-encode with input-side seeking (decodes at most one GOP before start)
+#   auto      copy if start is on a keyframe, else smart for H.264/HEVC, else accurate
+# All modes seek on the input side, so latency doesn't depend on where the clip is in the file.
+# Keyframe times come from the packet headers (no decoding) and are cached per video.
+
+KEYFRAME_CACHE_FOLDER = "./cache/keyframes"
+KEYFRAME_TOLERANCE_SEC = 0.02  # a cut this close to a keyframe counts as on it
+SMART_CUT_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+CLIP_VIDEO_ARGS = ["-c:v", "libx264", "-crf", "23", "-preset", "fast"]
+CLIP_AUDIO_ARGS = ["-c:a", "aac"]
+EDGE_CRF = "18"  # re-encoded GOP edges sit next to copied frames, keep them close to the source
+MAX_CLIPS_PER_FFMPEG = 32  # extract_clips: outputs per ffmpeg process (each holds an encoder)
+# Common format of clips that are joined into one supercut (sources differ in size, fps, audio layout)
+SUPERCUT_VIDEO_FILTER = ("scale=1280:720:force_original_aspect_ratio=decrease,"
+                         "pad=1280:720:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=25,format=yuv420p")
+SUPERCUT_AUDIO_FILTER = "aformat=sample_fmts=fltp:sample_rates=48000:channel_layouts=stereo"
+SUPERCUT_SILENCE = "anullsrc=r=48000:cl=stereo"  # audio track for sources without one
+CLIP_RUN_GAP_SEC = 30.0  # extract_clips: clips closer than this share one input (decoding the gap beats a new seek)
+
+
+async def _read_keyframes(stream, keyframes: list):
+    async for line in stream:
+        pts_time, _, flags = line.decode(errors="replace").strip().partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+
+
+async def _probe_uncached(video_path: str) -> dict:
+    streams = (await probe_media_async(video_path))["streams"]  # shared metadata cache, only the packet scan is new
+    stream = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+
+    # One line per packet: parsed as it arrives instead of buffering the whole listing
+    command = ["ffprobe", "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path]
+    async with _ffmpeg_slot():
+        process = await asyncio.create_subprocess_exec(
+            *command, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        keyframes, tail = [], deque(maxlen=STDERR_TAIL_LINES)
+        await _kill_on_cancel(process, asyncio.gather(_read_keyframes(process.stdout, keyframes),
+                                                      _drain_stderr(process.stderr, tail)))
+        returncode = await _kill_on_cancel(process, process.wait())
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, stderr="\n".join(tail))
+
+    return {"stream": stream, "keyframes": sorted(keyframes)}
+
+
+def probe_video(video_path: str, cache_folder: str = KEYFRAME_CACHE_FOLDER) -> dict:
+    """
+    {"stream": {codec_name, profile, pix_fmt, width, height, ...}, "keyframes": [seconds]}
+    for the first video stream, cached on disk by path + size + mtime.
+    """
+    cache_path = _probe_cache_path(video_path, cache_folder)
+    probe = _load_probe(cache_path)
+    if probe is None:
+        with pipeline_metrics.stage("keyframe_probe", source=video_path):
+            probe = asyncio.run(_probe_uncached(video_path))
+        _store_probe(cache_path, probe)
+    return probe
+
+
+def _seconds_up(seconds: float) -> str:
+    """
+    Seconds as a millisecond -ss/-t value, rounded up. An input-side seek onto a keyframe must not
+    land even 1 ms before it: a stream copy would then start at the previous keyframe (a whole GOP more).
+    """
+    return f"{math.ceil(seconds * 1000 - 1e-6) / 1000:.3f}"
+
+
+def _seconds_down(seconds: float) -> str:
+    """Seconds as a millisecond -ss/-t value, rounded down (an output-side cut that must keep the frame at it)."""
+    return f"{max(0, math.floor(seconds * 1000 + 1e-6)) / 1000:.3f}"
+
+
+def plan_clip(keyframes: list, start: float, end: float, codec: str = None, mode: str = "auto"):
+    """
+    Decide how to cut [start, end). Returns (mode, first_keyframe, last_keyframe):
+    the copied middle of a smart cut is [first_keyframe, last_keyframe).
+    """
+    keyframes = np.asarray(keyframes, dtype=np.float64)
+    i = int(np.searchsorted(keyframes, start - KEYFRAME_TOLERANCE_SEC))
+    first = float(keyframes[i]) if i < len(keyframes) else None
+    j = int(np.searchsorted(keyframes, end + KEYFRAME_TOLERANCE_SEC)) - 1
+    last = float(keyframes[j]) if j >= 0 else None
+    on_keyframe = first is not None and abs(first - start) <= KEYFRAME_TOLERANCE_SEC
+
+    if mode == "auto":
+        if on_keyframe:
+            mode = "copy"
+        elif codec in SMART_CUT_ENCODERS and first is not None and last is not None and first < last:
+            mode = "smart"
+        else:
+            mode = "accurate"
+    return mode, first, last
+
+
+def _edge_encode_args(stream: dict) -> list:
+    """Encoder settings for re-encoded GOP edges that can be concatenated with the copied source frames."""
+    encoder = SMART_CUT_ENCODERS[stream["codec_name"]]
+    args = ["-c:v", encoder, "-crf", EDGE_CRF, "-preset", "fast"]
+    # Parameter sets in-band at every keyframe: the joined stream can't rely on one set of extradata
+    args += ["-x264-params" if encoder == "libx264" else "-x265-params", "repeat-headers=1"]
+    if stream.get("pix_fmt"):
+        args += ["-pix_fmt", stream["pix_fmt"]]
+    profile = (stream.get("profile") or "").lower().replace("constrained ", "")
+    if profile in ("baseline", "main", "high", "high10", "high422", "high444"):
+        args += ["-profile:v", profile]
+    return args
+
+
+def _smart_cut(video_path: str, start: float, end: float, first: float, last: float, stream: dict,
+               output_path: str):
+    """
+    Re-encode [start, first) and [last, end), copy [first, last), then mux audio cut from the source.
+    Parts are Annex B MPEG-TS with their parameter sets in-band (the copied middle gets the source's
+    SPS/PPS/VPS inserted by the *_mp4toannexb filter), so each part decodes with its own parameters.
+    """
+    work = tempfile.mkdtemp(prefix=".smartcut_", dir=os.path.dirname(output_path) or ".")
+    try:
+        parts = []
+        edges = _edge_encode_args(stream)
+        middle = ["-c:v", "copy", "-bsf:v", f"{stream['codec_name']}_mp4toannexb"]
+        # Parts meet exactly on the keyframes: the first edge stops before keyframe first, the copied
+        # middle seeks exactly onto it and stops before keyframe last
+        pieces = [
+            (start, first, f"{start:.3f}", _seconds_down(first - float(f"{start:.3f}")), edges),
+            (first, last, _seconds_up(first), _seconds_down(last - float(_seconds_up(first))), middle),
+            (last, end, f"{last:.3f}", f"{end - last:.3f}", edges),
+        ]
+        for n, (piece_start, piece_end, seek, length, codec_args) in enumerate(pieces):
+            if piece_end - piece_start <= KEYFRAME_TOLERANCE_SEC:
+                continue
+            part = os.path.join(work, f"part{n}.ts")
+            run_ffmpeg([
+                "ffmpeg", "-y", "-v", "error",
+                "-ss", seek, "-i", video_path,
+                "-t", length,
+                "-map", "0:v:0", "-an", "-sn", *codec_args,
+                part
+            ])
+            parts.append(part)
+
+        concat_list = os.path.join(work, "parts.txt")
+        with open(concat_list, "w", encoding="utf-8") as f:
+            f.writelines(f"file '{os.path.basename(part)}'\n" for part in parts)
+
+        run_ffmpeg([
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", concat_list,
+            "-ss", f"{start:.3f}", "-i", video_path,
+            "-t", f"{end - start:.3f}",
+            "-map", "0:v:0", "-map", "1:a:0?",
+            "-c:v", "copy", *CLIP_AUDIO_ARGS,
+            output_path
+        ])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _decodes_cleanly(video_path: str) -> bool:
+    """Decode the whole video stream; False on any decoder error (e.g. frames decoded with the wrong SPS/PPS)."""
+    try:
+        errors = run_ffmpeg(["ffmpeg", "-v", "error", "-xerror", "-i", video_path, "-map", "0:v:0", "-f", "null", "-"])
+    except subprocess.CalledProcessError:
+        return False
+    return not errors
+
+
+_smart_cut_failed = set()  # videos whose smart cuts didn't decode cleanly: accurate from then on
+
+
+def _verified_smart_cut(video_path: str, start: float, end: float, first: float, last: float, stream: dict,
+                        output_path: str) -> bool:
+    """Smart cut + decode check. False (output to be redone) if either fails."""
+    if video_path in _smart_cut_failed:
+        return False
+    try:
+        _smart_cut(video_path, start, end, first, last, stream, output_path)
+        if _decodes_cleanly(output_path):
+            return True
+    except subprocess.CalledProcessError:
+        pass
+    _smart_cut_failed.add(video_path)
+    return False
+
+
+def extract_clip(video_path: str, start: float, end: float, output_path: str, mode: str = "auto") -> str:
+    """Cut [start, end) seconds of video_path into output_path (see the modes above). Returns output_path."""
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    start = max(0.0, start)
+    duration = end - start
+
+    probe = probe_video(video_path) if mode != "accurate" else {"stream": {}, "keyframes": []}
+    mode, first, last = plan_clip(probe["keyframes"], start, end, probe["stream"].get("codec_name"), mode)
+
+    with pipeline_metrics.stage("clip_extract", source=video_path, mode=mode, clip_sec=round(duration, 3)) as metrics:
+        if mode == "smart":
+            if _verified_smart_cut(video_path, start, end, first, last, probe["stream"], output_path):
+                return output_path
+            mode = metrics["mode"] = "accurate"
+
+        if mode == "copy":
+            start = first  # start may sit up to KEYFRAME_TOLERANCE_SEC before the keyframe it counts as on
+            seek = _seconds_up(start)
+            run_ffmpeg([
+                "ffmpeg", "-y", "-v", "error",
+                "-ss", seek, "-i", video_path,
+                "-t", f"{end - float(seek):.3f}",
+                "-map", "0:v:0", "-map", "0:a:0?",
+                "-c", "copy", "-avoid_negative_ts", "make_zero",
+                output_path
+            ])
+        else:
+            run_ffmpeg([
+                "ffmpeg", "-y", "-v", "error",
+                "-ss", f"{start:.3f}", "-i", video_path,
+                "-t", f"{duration:.3f}",
+                *CLIP_VIDEO_ARGS, *CLIP_AUDIO_ARGS,
+                output_path
+            ])
+    return output_path
+
+
+def _clip_runs(clips: list) -> list:
+    """Time-sorted [(start, end, output_path, mode)] split into runs that share one ffmpeg input."""
+    runs, run_end = [], None
+    for clip in sorted(clips, key=lambda clip: clip[0]):
+        if runs and len(runs[-1]) < MAX_CLIPS_PER_FFMPEG and clip[0] - run_end <= CLIP_RUN_GAP_SEC:
+            runs[-1].append(clip)
+            run_end = max(run_end, clip[1])
+        else:
+            runs.append([clip])
+            run_end = clip[1]
+    return runs
+
+
+def extract_clips(video_path: str, clips: list, mode: str = "auto", normalize: bool = False) -> list:
+    """
+    Cut many clips from one video. Clips are grouped into runs (see _clip_runs);
+    each run is one ffmpeg process with the video opened once, seeked to the
+    run's first clip and decoded once, every clip an output with its own -ss/-t.
+    clips: [(start, end, output_path)]. Smart cuts need several passes, so
+    "smart"/"auto" fall back to accurate for clips not starting on a keyframe.
+    normalize: re-encode every clip to the SUPERCUT_* format, always with an
+    audio track, so clips of different videos can be joined by concat_clips.
+    Returns (mode used, error or None) per clip, in order. A failed run fails only
+    its own clips, whose partial outputs are removed; the other runs still go ahead.
+    """
+    if normalize:
+        mode = "accurate"
+    has_audio = True
+    if normalize:
+        has_audio = any(stream.get("codec_type") == "audio" for stream in probe_media(video_path)["streams"])
+    probe = probe_video(video_path) if mode != "accurate" else {"stream": {}, "keyframes": []}
+    modes, planned = [], []
+    for start, end, output_path in clips:
+        start = max(0.0, start)
+        clip_mode, first, _ = plan_clip(probe["keyframes"], start, end, None, mode)
+        if clip_mode == "copy":
+            start = first  # exactly on the keyframe, so the copied output starts with it
+        else:
+            clip_mode = "accurate"
+        modes.append(clip_mode)
+        planned.append((start, end, output_path, clip_mode, len(planned)))
+    errors = [None] * len(planned)
+
+    for run in _clip_runs(planned):
+        # A copy run starts on its first clip's keyframe; seek exactly onto it, not a GOP earlier
+        origin = _seconds_up(run[0][0]) if run[0][3] == "copy" else f"{run[0][0]:.3f}"
+        inputs = ["-ss", origin, "-i", video_path]
+        if not has_audio:
+            inputs += ["-f", "lavfi", "-i", SUPERCUT_SILENCE]
+        outputs = []
+        for start, end, output_path, clip_mode, _ in run:
+            folder = os.path.dirname(output_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            # Output-side offsets round down so a copied clip keeps the keyframe it starts on
+            if clip_mode == "copy":
+                offset = _seconds_down(start - float(origin))
+            else:
+                offset = f"{max(0.0, start - float(origin)):.3f}"
+            outputs += ["-ss", offset, "-t", f"{end - start:.3f}", "-map", "0:v:0"]
+            if normalize:
+                outputs += ["-map", "0:a:0" if has_audio else "1:a:0",
+                            "-vf", SUPERCUT_VIDEO_FILTER, "-af", SUPERCUT_AUDIO_FILTER,
+                            *CLIP_VIDEO_ARGS, *CLIP_AUDIO_ARGS, "-ar", "48000", "-ac", "2"]
+            elif clip_mode == "copy":
+                outputs += ["-map", "0:a:0?", "-c", "copy", "-avoid_negative_ts", "make_zero"]
+            else:
+                outputs += ["-map", "0:a:0?", *CLIP_VIDEO_ARGS, *CLIP_AUDIO_ARGS]
+            outputs.append(output_path)
+
+        try:
+            with pipeline_metrics.stage("clips_extract", source=video_path, clips=len(run)):
+                run_ffmpeg(["ffmpeg", "-y", "-v", "error", *inputs, *outputs])
+        except subprocess.CalledProcessError as e:
+            error = f"ffmpeg exited with {e.returncode}" + (f": {e.stderr.splitlines()[-1]}" if e.stderr else "")
+        except OSError as e:
+            error = f"{type(e).__name__}: {e}"
+        else:
+            continue
+        for _, _, output_path, _, n in run:
+            errors[n] = error
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    return list(zip(modes, errors))
+
+
+def concat_clips(clip_paths: list, output_path: str) -> str:
+    """
+    Join clips without re-encoding. They must share codec, size, frame rate and audio
+    layout: extract_clips(..., normalize=True) clips, not clips of arbitrary sources.
+    """
+    folder = os.path.dirname(output_path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, concat_list = tempfile.mkstemp(prefix=".concat_", suffix=".txt", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines("file '" + os.path.abspath(path).replace("'", "'\\''") + "'\n" for path in clip_paths)
+        run_ffmpeg(["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", concat_list,
+                     "-c", "copy", output_path])
+    finally:
+        os.remove(concat_list)
+    return output_path
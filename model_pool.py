@@ -0,0 +1,139 @@
+# model_pool.py
+#
+# Process-wide registry of loaded WhisperModel instances.
+# Loading weights + CTranslate2 init is the expensive part of a transcription,
+# so every caller (menu options, batch mode, ...) should go through get_model()
+# instead of constructing WhisperModel directly.
+
+import os
+import threading
+from collections import OrderedDict
+
+from faster_whisper import WhisperModel
+
+# Approximate resident size in MB of each model with float32 weights.
+MODEL_SIZES_MB = {
+    "tiny": 75,
+    "base": 145,
+    "small": 484,
+    "medium": 1530,
+    "large-v1": 3090,
+    "large-v2": 3090,
+    "large-v3": 3090,
+    "large": 3090,
+    "large-v3-turbo": 1620,
+    "turbo": 1620,
+    "distil-large-v3": 1510,
+}
+
+# Weight size relative to float32 for each compute_type.
+COMPUTE_TYPE_FACTORS = {
+    "float32": 1.0,
+    "default": 1.0,
+    "auto": 1.0,
+    "float16": 0.5,
+    "bfloat16": 0.5,
+    "int8_float32": 0.25,
+    "int8_float16": 0.25,
+    "int8_bfloat16": 0.25,
+    "int8": 0.25,
+}
+
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get("WHISPER_POOL_BUDGET_MB", "4096"))
+
+
+def estimate_model_size_mb(model_path: str, compute_type: str = "default") -> float:
+    """Estimate the memory footprint of a model, used for budget accounting."""
+    if os.path.isdir(model_path):
+        model_bin = os.path.join(model_path, "model.bin")
+        if os.path.isfile(model_bin):
+            # Converted models are already quantized on disk.
+            return os.path.getsize(model_bin) / (1024 * 1024)
+
+    name = os.path.basename(os.path.normpath(model_path)).lower()
+    name = name.replace("faster-whisper-", "")
+    size = MODEL_SIZES_MB.get(name, MODEL_SIZES_MB["large-v3"])
+    return size * COMPUTE_TYPE_FACTORS.get(compute_type, 1.0)
+
+
+class WhisperModelPool:
+    """
+    LRU cache of WhisperModel instances keyed by
+    (model, device, compute_type, cpu_threads, other WhisperModel kwargs).
+
+    Models are evicted least-recently-used first once the estimated
+    total size goes over memory_budget_mb. The most recently requested
+    model is always kept, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB):
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()  # key -> (model, size_mb)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_path, device="cpu", compute_type="default", cpu_threads=0, **model_kwargs):
+        # Extra kwargs (device_index, num_workers, download_root, ...) change the loaded model too;
+        # lists (device_index=[0, 1]) become tuples so the key stays hashable
+        extra = tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value) for name, value in model_kwargs.items()
+        ))
+        return (model_path, device, compute_type, int(cpu_threads), extra)
+
+    def get(self, model_path: str, device: str = "cpu", compute_type: str = "default",
+            cpu_threads: int = 0, **model_kwargs) -> WhisperModel:
+        """Return a warm model for the key, loading it on first use."""
+        key = self.make_key(model_path, device, compute_type, cpu_threads, **model_kwargs)
+
+        # Loading under the lock keeps two threads from loading the same weights twice.
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry[0]
+
+            model = WhisperModel(
+                model_path,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                **model_kwargs
+            )
+            self._models[key] = (model, estimate_model_size_mb(model_path, compute_type))
+            self._evict()
+            return model
+
+    def _evict(self):
+        while len(self._models) > 1 and self.used_mb() > self.memory_budget_mb:
+            self._models.popitem(last=False)
+
+    def used_mb(self) -> float:
+        return sum(size for _, size in self._models.values())
+
+    def set_memory_budget(self, memory_budget_mb: float):
+        with self._lock:
+            self.memory_budget_mb = memory_budget_mb
+            self._evict()
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._models.keys())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+# ------------------ MODULE-LEVEL POOL ------------------
+
+_pool = WhisperModelPool()
+
+
+def get_model(model_path: str, device: str = "cpu", compute_type: str = "default",
+              cpu_threads: int = 0, **model_kwargs) -> WhisperModel:
+    """Return a shared WhisperModel from the process-wide pool."""
+    return _pool.get(model_path, device, compute_type, cpu_threads, **model_kwargs)
+
+
+def get_pool() -> WhisperModelPool:
+    return _pool
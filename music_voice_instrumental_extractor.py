@@ -4,6 +4,9 @@ import soundfile as sf
 import torch
 import torchaudio
 import warnings
+
+from media_utils import extract_wav
+
 warnings.filterwarnings("ignore", category=UserWarning, module="torchaudio")
 
 # --- CONFIG ---
@@ -49,15 +52,7 @@ print(f"Vocals ready for Whisper: {vocals_file}")
 
 # --- STEP 3: Convert no_vocals (instrumental) to mono 16kHz 16-bit WAV with ffmpeg ---
 no_vocals_src = os.path.join(demucs_out_dir, "no_vocals.wav")
-subprocess.run([
-    "ffmpeg",
-    "-y",                     # overwrite
-    "-i", no_vocals_src,      # Demucs output
-    "-ac", "1",               # mono
-    "-ar", str(target_sr),    # 16 kHz
-    "-c:a", "pcm_s16le",      # 16-bit PCM
-    instrumental_file
-])
+extract_wav(no_vocals_src, instrumental_file, target_sr)  # mono, 16 kHz, 16-bit PCM, overwrites
 print(f"Instrumental (karaoke) saved: {instrumental_file}")
 
 # --- STEP 4: Whisper usage example ---
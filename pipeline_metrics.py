@@ -0,0 +1,207 @@
+# pipeline_metrics.py
+#
+# Stage-level timing/resource metrics for the movie -> SRT pipeline.
+#
+# Off by default. Enable with the env var TRANSCRIBER_METRICS=<path> (or
+# enable(path) / the --metrics flag of the batch tools):
+#   *.prom  -> Prometheus text exposition, cumulative per stage (rewritten on every record);
+#              use "{pid}" in the path when several processes write metrics
+#   else    -> one JSON line per stage run (appended, safe for several processes)
+#
+# Each record has wall time, CPU time, the process's peak RSS so far (ru_maxrss:
+# it never goes down, so it bounds the stage's memory but isn't attributable to
+# it) and, when known, the audio seconds the stage processed.
+# When disabled, stage() returns a shared no-op and timed_iter() returns the
+# iterable unchanged, so instrumented code pays (almost) nothing.
+
+import json
+import os
+import resource
+import threading
+import time
+
+ENV_VAR = "TRANSCRIBER_METRICS"
+
+_lock = threading.Lock()
+_path = os.environ.get(ENV_VAR) or None
+_totals = {}  # stage -> {"count", "wall_sec", "cpu_sec", "audio_sec"} for Prometheus output
+
+
+def enable(path: str):
+    """Turn metrics on for this process and for processes it spawns."""
+    global _path
+    _path = path
+    os.environ[ENV_VAR] = path
+
+
+def disable():
+    global _path
+    _path = None
+    os.environ.pop(ENV_VAR, None)
+
+
+def is_enabled() -> bool:
+    return _path is not None
+
+
+def _process_peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+def record(stage_name: str, wall_sec: float, cpu_sec: float, audio_sec: float = None, **fields):
+    """Emit one stage record to the configured sink."""
+    if _path is None:
+        return
+    entry = {
+        "ts": round(time.time(), 3),
+        "pid": os.getpid(),
+        "stage": stage_name,
+        "wall_sec": round(wall_sec, 4),
+        "cpu_sec": round(cpu_sec, 4),
+        "process_peak_rss_mb": round(_process_peak_rss_mb(), 1),
+        "audio_sec": round(audio_sec, 2) if audio_sec is not None else None,
+        **fields,
+    }
+    with _lock:
+        if _path.endswith(".prom"):
+            _write_prometheus(entry)
+        else:
+            _append_json_line(entry)
+
+
+def _append_json_line(entry: dict):
+    folder = os.path.dirname(_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def _write_prometheus(entry: dict):
+    totals = _totals.setdefault(entry["stage"], {"count": 0, "wall_sec": 0.0, "cpu_sec": 0.0, "audio_sec": 0.0})
+    totals["count"] += 1
+    totals["wall_sec"] += entry["wall_sec"]
+    totals["cpu_sec"] += entry["cpu_sec"]
+    totals["audio_sec"] += entry["audio_sec"] or 0.0
+
+    lines = []
+    for metric, name, help_text in (
+        ("count", "transcriber_stage_runs_total", "Number of completed stage runs"),
+        ("wall_sec", "transcriber_stage_wall_seconds_total", "Wall-clock seconds spent in stage"),
+        ("cpu_sec", "transcriber_stage_cpu_seconds_total", "Process CPU seconds spent in stage"),
+        ("audio_sec", "transcriber_stage_audio_seconds_total", "Audio seconds processed by stage"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for stage_name, values in sorted(_totals.items()):
+            lines.append(f'{name}{{stage="{stage_name}"}} {values[metric]}')
+    lines.append("# HELP transcriber_peak_rss_megabytes Process peak resident set size")
+    lines.append("# TYPE transcriber_peak_rss_megabytes gauge")
+    lines.append(f"transcriber_peak_rss_megabytes {entry['process_peak_rss_mb']}")
+
+    path = _path.replace("{pid}", str(os.getpid()))
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+class _NullStage:
+    """Shared no-op returned by stage() when metrics are off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setitem__(self, key, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, name: str, inner=None, fields: dict = None):
+        self.name = name
+        self.inner = inner
+        self.fields = fields or {}
+
+    def __setitem__(self, key, value):
+        self.fields[key] = value
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        if isinstance(self.inner, _TimedIterator):
+            wall -= self.inner.total_wall
+            cpu -= self.inner.total_cpu
+        if exc[0] is not None:
+            self.fields["error"] = exc[0].__name__
+        record(self.name, wall, cpu, **self.fields)
+        return False
+
+
+def stage(name: str, inner=None, **fields):
+    """
+    Context manager timing one stage. Extra fields (e.g. audio_sec=, source=)
+    can be passed here or set inside the block: `with stage("x") as m: m["audio_sec"] = 12.5`.
+    inner: a timed_iter consumed inside the block whose time is subtracted.
+    """
+    if _path is None:
+        return _NULL_STAGE
+    return _Stage(name, inner, fields)
+
+
+class _TimedIterator:
+    """Accumulates the time spent producing items; records the stage when exhausted."""
+
+    def __init__(self, name: str, iterable, inner=None, fields: dict = None):
+        self.name = name
+        self.iterable = iterable
+        self.inner = inner
+        self.fields = fields or {}
+        self.total_wall = 0.0
+        self.total_cpu = 0.0
+
+    def __iter__(self):
+        iterator = iter(self.iterable)
+        while True:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                self.total_wall += time.perf_counter() - wall
+                self.total_cpu += time.process_time() - cpu
+            if "first_item_ts" not in self.fields:
+                self.fields["first_item_ts"] = round(time.time(), 3)
+            yield item
+
+        own_wall, own_cpu = self.total_wall, self.total_cpu
+        if isinstance(self.inner, _TimedIterator):
+            own_wall -= self.inner.total_wall
+            own_cpu -= self.inner.total_cpu
+        record(self.name, own_wall, own_cpu, **self.fields)
+
+
+def timed_iter(name: str, iterable, inner=None, **fields):
+    """
+    Time a lazy stage (e.g. the segment generator). inner: another timed_iter
+    feeding this one, whose time is subtracted so nested stages don't double count.
+    The record also has first_item_ts, when the first item came out (e.g. first-segment latency).
+    """
+    if _path is None:
+        return iterable
+    return _TimedIterator(name, iterable, inner, fields)
@@ -0,0 +1,157 @@
+# qc_index.py
+#
+# Persistent index for incremental QC.
+#
+# Per SRT it stores size/mtime, a content hash, the rules hash, one short hash
+# per cue and the issues found per cue position. On the next run:
+#   - same size + mtime + rules      -> skipped, the stored issues are returned
+#   - same content hash              -> unchanged, only the stat is refreshed
+#   - rules changed / no entry       -> full check
+#   - content changed                -> cue hashes are diffed against the old
+#     ones; issues of unchanged cues are reused (re-numbered) and only edited
+#     cues plus the cue right after each edit (GAP_TOO_SMALL looks at the
+#     previous cue) are re-evaluated.
+
+import hashlib
+import json
+import os
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from srt_parser import iter_srt, parse_errors_to_issues
+from subtitles_rules import SubtitleColumns, check_columns_by_position, profile_hash
+
+QC_INDEX_PATH = "./cache/qc_index.json"
+
+
+def rules_hash(rules: dict) -> str:
+    return profile_hash(rules)
+
+
+def _content_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cue_hash(sub) -> str:
+    return hashlib.blake2b(f"{sub.start!r}|{sub.end!r}|{sub.text}".encode(), digest_size=8).hexdigest()
+
+
+def is_fresh(entry: dict, srt_path: str, current_rules_hash: str) -> bool:
+    """True if the stored entry can be used without even reading the file."""
+    if not entry or entry["rules_hash"] != current_rules_hash:
+        return False
+    try:
+        stat = os.stat(srt_path)
+    except OSError:
+        return False
+    return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+
+def entry_issues(entry: dict) -> list:
+    """Issues of an index entry, in check_subtitles order (parse errors first)."""
+    issues = parse_errors_to_issues(entry["parse_errors"])
+    for position in sorted(entry["cue_issues"], key=int):
+        issues.extend(entry["cue_issues"][position])
+    return issues
+
+
+def _evaluate(subs: list, positions: list, rules: dict) -> dict:
+    """Re-check the given cue positions; each contiguous run is evaluated with its previous cue as context."""
+    results = {position: [] for position in positions}
+    runs = []
+    for position in sorted(positions):
+        if runs and position == runs[-1][1] + 1:
+            runs[-1][1] = position
+        else:
+            runs.append([position, position])
+
+    for first, last in runs:
+        context = 1 if first > 0 else 0
+        cols = SubtitleColumns.from_subtitles(subs[first - context:last + 1])
+        for window_position, found in check_columns_by_position(cols, rules):
+            if window_position >= context:
+                results[first - context + window_position].append(found)
+    return results
+
+
+def qc_file_incremental(srt_path: str, rules: dict, current_rules_hash: str, entry: dict = None):
+    """
+    QC one file reusing what `entry` (its previous index entry) already knows.
+    Returns (issues, new_entry, status) with status full | unchanged | incremental.
+    """
+    stat = os.stat(srt_path)
+    content_hash = _content_hash(srt_path)
+    same_rules = bool(entry) and entry["rules_hash"] == current_rules_hash
+
+    if same_rules and entry["content_hash"] == content_hash:
+        entry = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        return entry_issues(entry), entry, "unchanged"
+
+    errors = []
+    subs = list(iter_srt(Path(srt_path), errors))
+    cue_hashes = [_cue_hash(sub) for sub in subs]
+
+    if not same_rules:
+        status = "full"
+        cue_issues = _evaluate(subs, list(range(len(subs))), rules)
+    else:
+        status = "incremental"
+        old_issues = entry["cue_issues"]
+        cue_issues, dirty = {}, []
+        matcher = SequenceMatcher(None, entry["cue_hashes"], cue_hashes, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != "equal":
+                dirty.extend(range(j1, j2))
+                continue
+            for k in range(j2 - j1):
+                reused = old_issues.get(str(i1 + k))
+                if reused:
+                    cue_issues[j1 + k] = [dict(found, index=subs[j1 + k].index) for found in reused]
+            if (i1, j1) != (0, 0):
+                dirty.append(j1)  # its previous cue changed -> gap must be re-checked
+        cue_issues.update(_evaluate(subs, dirty, rules))
+
+    new_entry = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "content_hash": content_hash,
+        "rules_hash": current_rules_hash,
+        "cue_hashes": cue_hashes,
+        "cue_issues": {str(position): found for position, found in cue_issues.items() if found},
+        "parse_errors": [{"line": e["line"], "reason": e["reason"]} for e in errors],
+    }
+    return entry_issues(new_entry), new_entry, status
+
+
+class QCIndex:
+    """JSON file mapping absolute SRT path -> index entry."""
+
+    def __init__(self, path: str = QC_INDEX_PATH):
+        self.path = path
+        self.entries = {}
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(srt_path: str) -> str:
+        return os.path.abspath(srt_path)
+
+    def get(self, srt_path: str):
+        return self.entries.get(self.key(srt_path))
+
+    def put(self, srt_path: str, entry: dict):
+        self.entries[self.key(srt_path)] = entry
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -1,9 +1,25 @@
 # qc_runner.py
+#
+# Single file:  run_qc(srt_path)
+# Corpus:       python qc_runner.py ./subtitles --workers 8 --results results.jsonl --summary summary.json
+# Incremental:  add --incremental to skip unchanged files / re-check only edited cues (qc_index.py)
 
+import argparse
+import csv
 import json
-import re
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from subtitles_rules import Subtitle, check_subtitles
+from subtitles_rules import RULE_REGISTRY, check_columns
+from srt_parser import iter_srt, parse_errors_to_issues, parse_srt_columns
+from qc_index import QC_INDEX_PATH, QCIndex, entry_issues, is_fresh, qc_file_incremental, rules_hash
+import pipeline_metrics
+
+DEFAULT_RULES_PATH = "rules.json"
+WORST_OFFENDERS = 20
 
 
 def time_to_seconds(t):
@@ -12,29 +28,241 @@ def time_to_seconds(t):
     return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
 
 
-def parse_srt(path: Path):
-    blocks = re.split(r"\n\s*\n", path.read_text(encoding="utf-8").strip())
-    subs = []
+def parse_srt(path: Path, errors: list = None):
+    """Parse an SRT into Subtitle cues; malformed blocks are skipped and added to errors."""
+    return list(iter_srt(path, errors))
+
+
+def load_rules(rules_path=DEFAULT_RULES_PATH) -> dict:
+    return json.loads(Path(rules_path).read_text(encoding="utf-8"))
+
+
+def qc_file(srt_path: str, rules: dict) -> list:
+    """QC one SRT with already loaded rules (parse errors come first)."""
+    errors = []
+    cols = parse_srt_columns(Path(srt_path), errors)
+    return parse_errors_to_issues(errors) + check_columns(cols, rules)
+
+
+def run_qc(srt_path: str, rules_path=DEFAULT_RULES_PATH):
+    with pipeline_metrics.stage("qc", source=srt_path):
+        return qc_file(srt_path, load_rules(rules_path))
+
+
+# ------------------ CORPUS MODE ------------------
+
+_worker_rules = None
+_worker_rules_hash = None
+
+
+def _init_worker(rules: dict):
+    global _worker_rules, _worker_rules_hash
+    _worker_rules = rules
+    _worker_rules_hash = rules_hash(rules)
+
+
+def _qc_worker(srt_path: str) -> dict:
+    start = time.perf_counter()
+    try:
+        issues = qc_file(srt_path, _worker_rules)
+        error = None
+    except Exception as e:  # unreadable file etc. -> reported, never stops the corpus run
+        issues, error = [], f"{type(e).__name__}: {e}"
+    return {
+        "path": srt_path,
+        "issues": issues,
+        "error": error,
+        "elapsed_sec": round(time.perf_counter() - start, 4),
+    }
+
+
+def _qc_worker_incremental(job) -> tuple:
+    srt_path, entry = job
+    start = time.perf_counter()
+    try:
+        issues, entry, status = qc_file_incremental(srt_path, _worker_rules, _worker_rules_hash, entry)
+        error = None
+    except Exception as e:
+        issues, entry, status, error = [], None, "failed", f"{type(e).__name__}: {e}"
+    result = {
+        "path": srt_path,
+        "issues": issues,
+        "error": error,
+        "status": status,
+        "elapsed_sec": round(time.perf_counter() - start, 4),
+    }
+    return result, entry
+
+
+def find_srt_files(folder: str) -> list:
+    """All .srt files under folder, recursively, in a stable order."""
+    found = []
+    for root, _, files in os.walk(folder):
+        found.extend(os.path.join(root, f) for f in files if f.lower().endswith(".srt"))
+    return sorted(found)
 
-    for block in blocks:
-        lines = block.splitlines()
-        index = int(lines[0])
-        start, end = lines[1].split(" --> ")
-        text = "\n".join(lines[2:])
 
-        subs.append(
-            Subtitle(
-                index,
-                time_to_seconds(start),
-                time_to_seconds(end),
-                text
+class QCSummary:
+    """Aggregates streamed per-file results: counts per rule, worst offenders, timing."""
+
+    def __init__(self):
+        self.files = 0
+        self.failed_files = 0
+        self.files_with_issues = 0
+        self.rule_counts = Counter()
+        self.per_file = []  # (issue_count, elapsed_sec, path)
+        self.total_elapsed_sec = 0.0
+        self.statuses = Counter()  # incremental mode: skipped / unchanged / incremental / full
+
+    def add(self, result: dict):
+        self.files += 1
+        count = len(result["issues"])
+        if result["error"]:
+            self.failed_files += 1
+        if count:
+            self.files_with_issues += 1
+        self.rule_counts.update(i["rule"] for i in result["issues"])
+        self.per_file.append((count, result["elapsed_sec"], result["path"]))
+        self.total_elapsed_sec += result["elapsed_sec"]
+        if "status" in result:
+            self.statuses[result["status"]] += 1
+
+    def to_dict(self, top: int = WORST_OFFENDERS) -> dict:
+        worst = sorted(self.per_file, key=lambda item: item[0], reverse=True)[:top]
+        slowest = sorted(self.per_file, key=lambda item: item[1], reverse=True)[:top]
+        report = {
+            "files": self.files,
+            "files_with_issues": self.files_with_issues,
+            "failed_files": self.failed_files,
+            "total_issues": sum(self.rule_counts.values()),
+            "issues_per_rule": dict(self.rule_counts.most_common()),
+            "worst_offenders": [{"path": p, "issues": c} for c, _, p in worst if c],
+            "timing": {
+                "total_file_sec": round(self.total_elapsed_sec, 3),
+                "mean_file_sec": round(self.total_elapsed_sec / self.files, 4) if self.files else 0.0,
+                "slowest": [{"path": p, "elapsed_sec": t} for _, t, p in slowest],
+            },
+        }
+        if self.statuses:
+            report["incremental"] = dict(self.statuses)
+        return report
+
+
+class _ResultWriter:
+    """Streams per-file results as JSON lines or CSV rows (one row per file, issue counts per rule)."""
+
+    def __init__(self, path: str):
+        self.RULES = ["PARSE_ERROR"] + list(RULE_REGISTRY)
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._csv = None
+        if path.lower().endswith(".csv"):
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(["path", "issues", "elapsed_sec", "error"] + self.RULES)
+
+    def write(self, result: dict):
+        if self._csv:
+            counts = Counter(i["rule"] for i in result["issues"])
+            self._csv.writerow(
+                [result["path"], len(result["issues"]), result["elapsed_sec"], result["error"] or ""]
+                + [counts.get(rule, 0) for rule in self.RULES]
             )
-        )
+        else:
+            self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run_qc_corpus(srt_paths: list, rules_path=DEFAULT_RULES_PATH, workers: int = None,
+                  results_path: str = None, chunksize: int = 16, index_path: str = None) -> dict:
+    """
+    QC many SRT files on a process pool. Rules are loaded once and handed to
+    each worker; results are streamed to results_path as they complete.
+    With index_path, QC is incremental (see qc_index.py) and the index is updated.
+    Returns the summary dict.
+    """
+    rules = load_rules(rules_path)
+    summary = QCSummary()
+    writer = _ResultWriter(results_path) if results_path else None
+    wall_start = time.perf_counter()
+
+    def _collect(done, result):
+        summary.add(result)
+        if writer:
+            writer.write(result)
+        if result["error"]:
+            print(f"❌ [{done}/{len(srt_paths)}] {result['path']}: {result['error']}")
+
+    try:
+        if index_path is None:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as pool:
+                for done, result in enumerate(pool.map(_qc_worker, srt_paths, chunksize=chunksize), start=1):
+                    _collect(done, result)
+        else:
+            index = QCIndex(index_path)
+            current_rules_hash = rules_hash(rules)
+            jobs, done = [], 0
+            for srt_path in srt_paths:
+                entry = index.get(srt_path)
+                if is_fresh(entry, srt_path, current_rules_hash):
+                    done += 1
+                    _collect(done, {"path": srt_path, "issues": entry_issues(entry), "error": None,
+                                    "status": "skipped", "elapsed_sec": 0.0})
+                else:
+                    jobs.append((srt_path, entry))
+            if jobs:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as pool:
+                    for result, entry in pool.map(_qc_worker_incremental, jobs, chunksize=chunksize):
+                        done += 1
+                        _collect(done, result)
+                        if entry is not None:
+                            index.put(result["path"], entry)
+                index.save()
+    finally:
+        if writer:
+            writer.close()
+
+    report = summary.to_dict()
+    report["timing"]["wall_sec"] = round(time.perf_counter() - wall_start, 3)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run subtitle QC over a folder tree of SRT files.")
+    parser.add_argument("inputs", nargs="+", help="folders (searched recursively) and/or .srt files")
+    parser.add_argument("--rules", default=DEFAULT_RULES_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--results", default=None, help="per-file results, .jsonl or .csv")
+    parser.add_argument("--summary", default=None, help="write the summary JSON here")
+    parser.add_argument("--incremental", action="store_true", help="reuse results of unchanged files/cues")
+    parser.add_argument("--index", default=QC_INDEX_PATH, help="incremental QC index file")
+    parser.add_argument("--fail-on-issues", action="store_true", help="exit 1 if any issue is found")
+    args = parser.parse_args(argv)
+
+    srt_paths = []
+    for item in args.inputs:
+        srt_paths.extend(find_srt_files(item) if os.path.isdir(item) else [item])
+    if not srt_paths:
+        print("⚠️ No SRT files found")
+        return 0
+
+    report = run_qc_corpus(srt_paths, args.rules, args.workers, args.results,
+                           index_path=args.index if args.incremental else None)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(json.dumps({k: report[k] for k in ("files", "files_with_issues", "failed_files",
+                                             "total_issues", "issues_per_rule")}, indent=2))
+    if "incremental" in report:
+        print(f"♻️ {report['incremental']}")
+    print(f"⏱️ {report['timing']['wall_sec']}s wall")
 
-    return subs
+    if args.fail_on_issues and (report["total_issues"] or report["failed_files"]):
+        return 1
+    return 0
 
 
-def run_qc(srt_path: str, rules_path="rules.json"):
-    rules = json.loads(Path(rules_path).read_text(encoding="utf-8"))
-    subs = parse_srt(Path(srt_path))
-    return check_subtitles(subs, rules)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+# resegmenter.py
+#
+# QC-driven re-segmentation of transcribed segments.
+#
+# One pass over the words of the incoming segments (real word timestamps when
+# the model produced them, otherwise interpolated from character counts)
+# builds cues that already satisfy the active rules profile:
+#   - a new cue starts at pauses >= pause_split_threshold_sec, when the text
+#     would no longer wrap into max_lines x max_chars_per_line, when the cue
+#     would exceed max_duration_sec, or at a sentence end that would need a
+#     second line
+#   - text is wrapped into balanced lines
+#   - cues are re-timed: stretched towards the minimum duration / max CPS into
+#     the surrounding silence and trimmed to keep min_gap_sec
+#   - a cue that is still too short is merged into the next one if the result fits
+# Work per word is bounded by the cue size and only one finished cue is held
+# back (to know the next start), so the pass is linear and streams.
+
+from subtitles_rules import Subtitle, WordTimings
+
+SENTENCE_END = (".", "?", "!", "…")
+TIMING_EPSILON = 0.002  # SRT timestamps are truncated to ms, keep clear of the exact limits
+
+
+class SegmentationLimits:
+    """The thresholds of a rules profile the segmenter works against."""
+
+    def __init__(self, rules: dict):
+        timing = rules["timing"]
+        self.min_duration = timing["min_duration_sec"] + TIMING_EPSILON
+        self.max_duration = timing["max_duration_sec"] - TIMING_EPSILON
+        self.min_gap = timing["min_gap_sec"] + TIMING_EPSILON
+        self.pause_split = timing.get("pause_split_threshold_sec", 0.5)
+        self.max_cps = rules["reading_speed"]["max_cps"]
+        self.max_lines = rules["layout"]["max_lines"]
+        self.max_chars_per_line = rules["layout"]["max_chars_per_line"]
+
+
+def wrap_words(words: list, max_chars: int, max_lines: int):
+    """
+    Lines for the given words, or None if they don't fit. Two lines are
+    balanced (shortest possible longer line, top line not longer on ties);
+    more lines are filled greedily.
+    """
+    total = sum(len(word) for word in words) + len(words) - 1
+    if total <= max_chars:
+        return [" ".join(words)]
+    if max_lines < 2:
+        return None
+
+    if max_lines == 2:
+        best, best_key = None, None
+        top = -1
+        for k in range(1, len(words)):
+            top += len(words[k - 1]) + 1
+            bottom = total - top - 1
+            if top > max_chars:
+                break
+            if bottom > max_chars:
+                continue
+            key = (max(top, bottom), top > bottom)
+            if best_key is None or key < best_key:
+                best, best_key = k, key
+        if best is None:
+            return None
+        return [" ".join(words[:best]), " ".join(words[best:])]
+
+    lines, current = [], []
+    length = -1
+    for word in words:
+        if current and length + 1 + len(word) > max_chars:
+            lines.append(" ".join(current))
+            current, length = [], -1
+        current.append(word)
+        length += 1 + len(word)
+    lines.append(" ".join(current))
+    if len(lines) > max_lines or any(len(line) > max_chars for line in lines):
+        return None
+    return lines
+
+
+def _interpolated_words(start: float, end: float, text: str):
+    """Word timings for a segment without word timestamps, proportional to word length."""
+    words = text.split()
+    if not words:
+        return
+    weights = [len(word) + 1 for word in words]
+    step = (end - start) / sum(weights)
+    position = start
+    for word, weight in zip(words, weights):
+        yield position, position + weight * step, word
+        position += weight * step
+
+
+def iter_words(segments):
+    """(start, end, word) for every word of every segment, in order."""
+    for segment in segments:
+        words = getattr(segment, "words", None)
+        if isinstance(words, WordTimings):
+            yield from words
+        elif words:
+            for word in words:
+                text = word.word.strip()
+                if text:
+                    yield word.start, word.end, text
+        else:
+            yield from _interpolated_words(segment.start, segment.end, segment.text)
+
+
+class _Cue:
+    __slots__ = ("start", "end", "words", "lines")
+
+    def __init__(self, start, end, words, lines):
+        self.start = start
+        self.end = end
+        self.words = words
+        self.lines = lines
+
+    @property
+    def chars(self):
+        return sum(len(line) for line in self.lines) + len(self.lines) - 1
+
+
+def resegment(segments, rules: dict):
+    """
+    Re-cut any iterable of segments (start/end/text in seconds, optional
+    .words with start/end/word) into Subtitle cues that fit the rules profile.
+    """
+    limits = SegmentationLimits(rules)
+    pending = None  # finished cue held back until the next cue's start is known
+    previous_end = None  # end of the last emitted cue
+    words, texts = [], []
+
+    def close():
+        lines = wrap_words(texts, limits.max_chars_per_line, limits.max_lines) or [" ".join(texts)]
+        return _Cue(words[0][0], words[-1][1], list(texts), lines)
+
+    def fits(cue_words, start, end):
+        return (end - start <= limits.max_duration
+                and wrap_words(cue_words, limits.max_chars_per_line, limits.max_lines) is not None)
+
+    def emit(cue, next_start):
+        nonlocal previous_end
+        subtitle = _retime(cue, previous_end, next_start, limits)
+        previous_end = subtitle.end
+        return subtitle
+
+    def push(cue):
+        """Queue a finished cue; returns the cue that can be emitted now, if any."""
+        nonlocal pending
+        if pending is None:
+            pending = cue
+            return None
+        if _too_short(pending, cue.start, limits) and fits(pending.words + cue.words, pending.start, cue.end):
+            merged_words = pending.words + cue.words
+            pending = _Cue(pending.start, cue.end, merged_words,
+                           wrap_words(merged_words, limits.max_chars_per_line, limits.max_lines))
+            return None
+        ready, pending = pending, cue
+        return emit(ready, cue.start)
+
+    for start, end, text in iter_words(segments):
+        if words and _must_break(words, texts, start, end, text, limits):
+            ready = push(close())
+            if ready is not None:
+                yield ready
+            words, texts = [], []
+        words.append((start, end))
+        texts.append(text)
+
+    if words:
+        ready = push(close())
+        if ready is not None:
+            yield ready
+    if pending is not None:
+        yield emit(pending, None)
+
+
+def _must_break(words, texts, start, end, text, limits) -> bool:
+    if start - words[-1][1] >= limits.pause_split:
+        return True
+    if end - words[0][0] > limits.max_duration:
+        return True
+    candidate = texts + [text]
+    if wrap_words(candidate, limits.max_chars_per_line, limits.max_lines) is None:
+        return True
+    # A finished sentence is a good place to cut once the next one would need another line
+    if texts[-1].endswith(SENTENCE_END):
+        return sum(len(word) for word in candidate) + len(candidate) - 1 > limits.max_chars_per_line
+    return False
+
+
+def _needed_duration(cue, limits) -> float:
+    return min(max(limits.min_duration, cue.chars / limits.max_cps + TIMING_EPSILON), limits.max_duration)
+
+
+def _too_short(cue, next_start, limits) -> bool:
+    """True if the cue can't reach its needed duration before the next cue starts."""
+    return cue.start + _needed_duration(cue, limits) > next_start - limits.min_gap
+
+
+def _retime(cue, previous_end, next_start, limits) -> Subtitle:
+    start, end = cue.start, cue.end
+    needed = _needed_duration(cue, limits)
+    latest_end = next_start - limits.min_gap if next_start is not None else float("inf")
+    earliest_start = previous_end + limits.min_gap if previous_end is not None else 0.0
+
+    # Stretch into the following silence first, then into the preceding one
+    end = min(max(end, start + needed), latest_end)
+    if end - start < needed:
+        start = max(min(start, end - needed), earliest_start)
+    start = max(start, earliest_start)
+    if end <= start:
+        end = start + 0.01  # overlapping words: keep a valid cue
+    return Subtitle(None, start, end, "\n".join(cue.lines))
+
@@ -0,0 +1,197 @@
+# resumable_transcriber.py
+#
+# Checkpointed transcription jobs for preemptible nodes.
+#
+# Every raw segment is appended to a sidecar "<output>.progress.jsonl" as soon
+# as Whisper yields it (fsync'ed every checkpoint_interval seconds). A restart
+# with the same media + params replays the saved segments and decodes only the
+# audio after the last segment end (ffmpeg input-side seek), instead of
+# starting again from zero. The sidecar is removed once the SRT is complete.
+
+import argparse
+import json
+import os
+import time
+from itertools import chain
+
+from media_utils import decode_audio
+from model_pool import get_model
+from subtitles_cli import (
+    MODEL_PATH, RESEGMENT_RULES_PATH, SUBTITLES_FOLDER, WORD_TIMESTAMPS, load_resegment_rules, write_segments_to_srt
+)
+from subtitles_rules import Subtitle, WordTimings
+from transcription_cache import fingerprint_file
+import pipeline_metrics
+
+DEFAULT_CHECKPOINT_INTERVAL = 30.0  # seconds between fsyncs of the sidecar
+
+def checkpoint_path_for(output_srt: str) -> str:
+    return output_srt + ".progress.jsonl"
+
+
+def load_checkpoint(checkpoint_path: str, header: dict) -> list:
+    """
+    Return the segments saved by a previous run of the same job, or [] if there
+    is no checkpoint or it belongs to different media/params.
+    A torn last line (crash mid-write) is ignored.
+    """
+    if not os.path.isfile(checkpoint_path):
+        return []
+
+    segments = []
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        try:
+            saved_header = json.loads(f.readline())
+        except json.JSONDecodeError:
+            return []
+        if saved_header != header:
+            print(f"⚠️ Checkpoint {checkpoint_path} is for other media/params, starting over")
+            return []
+        for line in f:
+            try:
+                start, end, text = json.loads(line)
+            except (json.JSONDecodeError, ValueError):
+                break
+            segments.append(Subtitle(None, start, end, text))
+    return segments
+
+
+class CheckpointWriter:
+    """
+    Append-only JSONL sidecar: header line, then one [start, end, text] per segment.
+    Word timings are not checkpointed; resumed segments fall back to interpolated word times.
+    """
+
+    def __init__(self, checkpoint_path: str, header: dict, saved_segments: list,
+                 interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        self.interval = interval
+        self._last_sync = time.monotonic()
+        # Rewrite header + saved segments so a torn tail from the crash is dropped. The rewrite goes to a
+        # temp file that replaces the old checkpoint only once it is on disk: a preemption in between
+        # must not cost the progress saved so far.
+        tmp_path = f"{checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as self._file:
+            self._file.write(json.dumps(header) + "\n")
+            for segment in saved_segments:
+                self._write(segment)
+            self.sync()
+        os.replace(tmp_path, checkpoint_path)
+        self._file = open(checkpoint_path, "a", encoding="utf-8")
+
+    def _write(self, segment):
+        self._file.write(json.dumps([segment.start, segment.end, segment.text], ensure_ascii=False) + "\n")
+
+    def append(self, segment):
+        self._write(segment)
+        self._file.flush()
+        if time.monotonic() - self._last_sync >= self.interval:
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+
+def _checkpointed_segments(model_segments, offset: float, writer: CheckpointWriter):
+    """Shift segments of the resumed audio to global time and checkpoint each one."""
+    for segment in model_segments:
+        words = WordTimings.from_words(segment.words, offset) if segment.words else None
+        segment = Subtitle(None, segment.start + offset, segment.end + offset, segment.text, words)
+        writer.append(segment)
+        yield segment
+
+
+def transcribe_resumable_to_srt(
+    media_path: str,
+    model_path: str = MODEL_PATH,
+    output_srt: str = None,
+    language: str = None,
+    translate: bool = False,
+    max_segment_duration: float = 10.0,
+    device: str = "cpu",
+    compute_type: str = "int8",
+    cpu_threads: int = 0,
+    checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    rules_path: str = RESEGMENT_RULES_PATH,
+    word_timestamps: bool = WORD_TIMESTAMPS,
+) -> str:
+    """Transcribe media to SRT, resuming from the sidecar checkpoint if one matches."""
+    if output_srt is None:
+        os.makedirs(SUBTITLES_FOLDER, exist_ok=True)
+        filename = os.path.splitext(os.path.basename(media_path))[0]
+        output_srt = os.path.join(SUBTITLES_FOLDER, filename + ".srt")
+
+    task = "translate" if translate else "transcribe"
+    header = {
+        "fingerprint": fingerprint_file(media_path),
+        "model": model_path,
+        "language": language,
+        "task": task,
+        "compute_type": compute_type,
+    }
+    checkpoint_path = checkpoint_path_for(output_srt)
+    saved_segments = load_checkpoint(checkpoint_path, header)
+    offset = saved_segments[-1].end if saved_segments else 0.0
+    if saved_segments:
+        print(f"⏩ Resuming from {offset:.1f}s ({len(saved_segments)} segments checkpointed)")
+
+    model = get_model(model_path, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+    audio = decode_audio(media_path, start=offset)
+
+    writer = CheckpointWriter(checkpoint_path, header, saved_segments, checkpoint_interval)
+    try:
+        model_segments, _ = model.transcribe(
+            audio,
+            language=language,
+            task=task,
+            condition_on_previous_text=False,
+            word_timestamps=word_timestamps or rules_path is not None
+        )
+        new_segments = _checkpointed_segments(model_segments, offset, writer)
+        write_segments_to_srt(chain(saved_segments, new_segments), output_srt, max_segment_duration,
+                              rules=load_resegment_rules(rules_path))
+    finally:
+        writer.close()
+
+    os.remove(checkpoint_path)  # job complete
+    return output_srt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checkpointed, resumable transcription of one media file.")
+    parser.add_argument("media")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--language", default=None, help="language code, autodetect if omitted")
+    parser.add_argument("--translate", action="store_true")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--cpu-threads", type=int, default=0)
+    parser.add_argument("--checkpoint-interval", type=float, default=DEFAULT_CHECKPOINT_INTERVAL)
+    parser.add_argument("--metrics", default=None, help="write stage metrics (.jsonl or .prom)")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        pipeline_metrics.enable(args.metrics)
+
+    output_srt = transcribe_resumable_to_srt(
+        args.media,
+        model_path=args.model,
+        output_srt=args.output,
+        language=args.language,
+        translate=args.translate,
+        device=args.device,
+        compute_type=args.compute_type,
+        cpu_threads=args.cpu_threads,
+        checkpoint_interval=args.checkpoint_interval,
+    )
+    print(f"✅ Transcript saved: {output_srt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# segment_index.py
+#
+# Local full-text index over subtitle segments (SQLite FTS5).
+#
+# database_api.search_segments_by_text scans the segments table on every
+# query; this keeps a copy of the segment rows next to an FTS5 index so text
+# search is an index lookup with bm25 ranking, phrase and prefix queries.
+#
+# - tokenizer: unicode61 with diacritics folded (Latin, Cyrillic, Greek, ...)
+# - rows use the same 13-column layout as database_api segment rows
+# - built from the database on first use (open_search_index) and marked complete;
+#   until then searches go to the database, so older subtitles are never missing
+# - updated incrementally: option_save_srt_to_database indexes the SRT it just
+#   saved; --rebuild-from-db backfills everything already in the database
+# - rows indexed straight from an SRT have no database segment_id until the next
+#   rebuild; they are addressed as "subtitle_id#segment_number" (get_segment)
+#
+# python segment_index.py "some phrase" --phrase --page 2
+# python segment_index.py --rebuild-from-db
+
+import argparse
+import os
+import sqlite3
+from pathlib import Path
+
+from srt_parser import iter_srt
+
+SEGMENT_INDEX_PATH = "./cache/segment_index.sqlite"
+TOKENIZER = "unicode61 remove_diacritics 2"
+DEFAULT_PAGE_SIZE = 20
+
+COLUMNS = ("segment_id", "subtitle_id", "time_start", "time_end", "text", "segment_number",
+           "video_title", "season", "episode", "series", "music_title", "language", "filename")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS segments (
+    rowid INTEGER PRIMARY KEY,
+    segment_id INTEGER,
+    subtitle_id INTEGER NOT NULL,
+    time_start TEXT,
+    time_end TEXT,
+    text TEXT NOT NULL,
+    segment_number INTEGER NOT NULL,
+    video_title TEXT,
+    season TEXT,
+    episode TEXT,
+    series TEXT,
+    music_title TEXT,
+    language TEXT,
+    filename TEXT,
+    UNIQUE (subtitle_id, segment_number)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='rowid', tokenize='{TOKENIZER}', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_au AFTER UPDATE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+    INSERT INTO segments_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
+"""
+
+
+def _srt_time(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    return f"{millis // 3600000:02}:{millis // 60000 % 60:02}:{millis // 1000 % 60:02},{millis % 1000:03}"
+
+
+def segment_rows(subtitle_id: int, cues, video_title=None, season=None, episode=None, series=None,
+                 music_title=None, language=None, filename=None) -> list:
+    """Index rows for the cues (objects with index/start/end/text) of one saved subtitle."""
+    return [
+        (None, subtitle_id, _srt_time(cue.start), _srt_time(cue.end), cue.text, cue.index,
+         video_title, season, episode, series, music_title, language, filename)
+        for cue in cues
+    ]
+
+
+def build_match_query(text: str, phrase: bool = False, prefix: bool = False) -> str:
+    """
+    Plain user text -> FTS5 MATCH expression. Every term is quoted, so
+    punctuation and FTS5 keywords in the input are taken literally.
+    phrase: terms must be adjacent and in order; prefix: the last term matches as a prefix.
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    if not terms:
+        return ""
+    if prefix:
+        terms[-1] += " *"
+    return "(" + " + ".join(terms) + ")" if phrase else " AND ".join(terms)
+
+
+class SearchPage:
+    """One page of search results: rows in database_api segment-row layout plus the total match count."""
+
+    def __init__(self, rows: list, total: int, page: int, page_size: int):
+        self.rows = rows
+        self.total = total
+        self.page = page
+        self.page_size = page_size
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.page_size))
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.pages
+
+
+class SegmentIndex:
+    def __init__(self, path: str = SEGMENT_INDEX_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.conn.execute("SELECT count(*) FROM segments").fetchone()[0]
+
+    def is_complete(self) -> bool:
+        """True once a full backfill from the database has finished (see rebuild_from_database)."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'complete'").fetchone()
+        return bool(row) and row[0] == "1"
+
+    def mark_complete(self):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('complete', '1')")
+
+    def get_segment(self, subtitle_id: int, segment_number: int):
+        """One segment row (database_api layout) by its subtitle and cue number, None if not indexed."""
+        return self.conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM segments WHERE subtitle_id = ? AND segment_number = ?",
+            (subtitle_id, segment_number)
+        ).fetchone()
+
+    # ------------------ UPDATES ------------------
+
+    def _upsert(self, rows):
+        placeholders = ", ".join("?" * len(COLUMNS))
+        updates = ", ".join(f"{column} = excluded.{column}" for column in COLUMNS)
+        self.conn.executemany(
+            f"INSERT INTO segments ({', '.join(COLUMNS)}) VALUES ({placeholders}) "
+            f"ON CONFLICT (subtitle_id, segment_number) DO UPDATE SET {updates}",
+            rows
+        )
+
+    def upsert_rows(self, rows):
+        """Insert/replace segment rows (13-tuples, database_api layout) in one transaction."""
+        with self.conn:
+            self._upsert(rows)
+
+    def replace_subtitles(self, rows_by_subtitle: dict):
+        """Replace all rows of each subtitle_id with the given ones, in a single transaction."""
+        with self.conn:
+            for subtitle_id, rows in rows_by_subtitle.items():
+                self.conn.execute("DELETE FROM segments WHERE subtitle_id = ?", (subtitle_id,))
+                self._upsert(rows)
+
+    def index_srt_file(self, subtitle_id: int, srt_path: str, video_title=None, season=None, episode=None,
+                       series=None, music_title=None, language=None, filename=None) -> int:
+        """
+        Index the cues of an SRT just saved as subtitle_id. The database
+        segment IDs are not known here (segment_id stays NULL until a rebuild);
+        segment_number is the cue number. Returns the number of cues indexed.
+        """
+        rows = segment_rows(subtitle_id, iter_srt(Path(srt_path)), video_title, season, episode, series,
+                            music_title, language, filename)
+        self.replace_subtitles({subtitle_id: rows})
+        return len(rows)
+
+    def remove_subtitle(self, subtitle_id: int):
+        with self.conn:
+            self.conn.execute("DELETE FROM segments WHERE subtitle_id = ?", (subtitle_id,))
+
+    def optimize(self):
+        """Merge FTS5 b-tree segments (worth running after big imports)."""
+        with self.conn:
+            self.conn.execute("INSERT INTO segments_fts(segments_fts) VALUES ('optimize')")
+
+    # ------------------ SEARCH ------------------
+
+    def search(self, text: str, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE, phrase: bool = False,
+               prefix: bool = False, language: str = None, raw: bool = False) -> SearchPage:
+        """
+        Ranked (bm25) search. text is plain words unless raw=True (FTS5 query
+        syntax as is). Returns one SearchPage; page is 1-based.
+        """
+        match = text if raw else build_match_query(text, phrase, prefix)
+        if not match:
+            return SearchPage([], 0, page, page_size)
+
+        where = "segments_fts MATCH ?"
+        params = [match]
+        if language:
+            where += " AND s.language = ?"
+            params.append(language)
+            count_sql = ("SELECT count(*) FROM segments_fts JOIN segments s ON s.rowid = segments_fts.rowid "
+                         f"WHERE {where}")
+        else:
+            count_sql = "SELECT count(*) FROM segments_fts WHERE segments_fts MATCH ?"  # no join needed
+
+        total = self.conn.execute(count_sql, params).fetchone()[0]
+        rows = self.conn.execute(
+            f"SELECT {', '.join('s.' + column for column in COLUMNS)} "
+            f"FROM segments_fts JOIN segments s ON s.rowid = segments_fts.rowid "
+            f"WHERE {where} ORDER BY segments_fts.rank LIMIT ? OFFSET ?",
+            params + [page_size, (max(1, page) - 1) * page_size]
+        ).fetchall()
+        return SearchPage(rows, total, page, page_size)
+
+
+def iter_database_rows(batch_size: int = 10000):
+    """
+    Every segment row in the database, in lists of at most batch_size.
+    Streams with keyset pages when database_api provides
+    get_segments_page(after_segment_id, limit) (rows ordered by segment_id);
+    otherwise all rows come from one search_segments_by_text("") call.
+    """
+    import database_api
+
+    read_page = getattr(database_api, "get_segments_page", None)
+    if read_page is None:
+        print("⚠️ database_api has no get_segments_page(), loading all segments at once")
+        rows = database_api.search_segments_by_text("")  # an empty pattern matches every segment
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+        return
+
+    after = 0
+    while True:
+        rows = read_page(after, batch_size)
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+
+def rebuild_from_database(index: SegmentIndex, batch_size: int = 10000) -> int:
+    """Backfill the index with every segment row in the database (real segment IDs), then mark it complete."""
+    count = 0
+    for rows in iter_database_rows(batch_size):
+        index.upsert_rows(rows)
+        count += len(rows)
+    index.optimize()
+    index.mark_complete()
+    return count
+
+
+def open_search_index(path: str = SEGMENT_INDEX_PATH):
+    """
+    The index, ready for searching: built from the database on first use.
+    None if that fails (callers then search the database).
+    """
+    index = SegmentIndex(path)
+    if index.is_complete():
+        return index
+    try:
+        print("🔎 Building the search index from the database (first use)...")
+        print(f"✅ Indexed {rebuild_from_database(index)} segments")
+        return index
+    except Exception as e:
+        index.close()
+        print(f"⚠️ Search index not built ({e}), searching the database")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search (or rebuild) the local subtitle segment index.")
+    parser.add_argument("query", nargs="?", default=None)
+    parser.add_argument("--index", default=SEGMENT_INDEX_PATH)
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--phrase", action="store_true", help="match the words as one phrase")
+    parser.add_argument("--prefix", action="store_true", help="last word matches as a prefix")
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--raw", action="store_true", help="query is FTS5 syntax")
+    parser.add_argument("--rebuild-from-db", action="store_true")
+    args = parser.parse_args(argv)
+
+    with SegmentIndex(args.index) as index:
+        if args.rebuild_from_db:
+            print(f"✅ Indexed {rebuild_from_database(index)} segments")
+        if not args.query:
+            return
+
+        result = index.search(args.query, args.page, args.page_size, args.phrase, args.prefix,
+                              args.language, args.raw)
+        print(f"🔍 {result.total} matches (page {result.page}/{result.pages})")
+        for row in result.rows:
+            segment = dict(zip(COLUMNS, row))
+            print(f"  [{segment['subtitle_id']}#{segment['segment_number']}] "
+                  f"{segment['time_start']} → {segment['time_end']}  {segment['text']!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# srt_parser.py
+#
+# Incremental, error-tolerant SRT parser.
+#
+# - reads bytes line by line from an mmap (default) or a plain file iterator
+# - yields cues lazily, so huge files never become one big string
+# - timestamps: fixed-width "hh:mm:ss,mmm" parsed straight from the bytes,
+#   regex fallback for loose variants (1-digit hours, '.' millis, positions)
+# - tolerates BOM, CRLF, missing indices and missing blank lines between cues
+# - malformed blocks are reported in `errors` instead of raising
+# - parse_srt_columns() builds the QC engine's columnar arrays without
+#   creating a Subtitle per cue
+
+import mmap
+import re
+
+from subtitles_rules import TAG_RE, Subtitle, SubtitleColumns
+
+BOM = b"\xef\xbb\xbf"
+ARROW = b" --> "
+
+LOOSE_TIMING_RE = re.compile(
+    rb"^\s*(\d{1,3}):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*(\d{1,3}):(\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+)
+
+
+def _fixed_timestamp(line: bytes, o: int) -> float:
+    """Seconds from the 12 bytes 'hh:mm:ss,mmm' at offset o (digits as byte values, no allocation)."""
+    return (
+        ((line[o] - 48) * 10 + line[o + 1] - 48) * 3600
+        + ((line[o + 3] - 48) * 10 + line[o + 4] - 48) * 60
+        + (line[o + 6] - 48) * 10 + line[o + 7] - 48
+        + ((line[o + 9] - 48) * 100 + (line[o + 10] - 48) * 10 + line[o + 11] - 48) / 1000
+    )
+
+
+def _is_fixed_timestamp(line: bytes, o: int) -> bool:
+    return (
+        line[o + 2] == 58 and line[o + 5] == 58 and line[o + 8] in (44, 46)  # ':' ':' ',' or '.'
+        and line[o:o + 2].isdigit() and line[o + 3:o + 5].isdigit()
+        and line[o + 6:o + 8].isdigit() and line[o + 9:o + 12].isdigit()
+    )
+
+
+def parse_timing(line: bytes):
+    """Return (start, end) seconds for an SRT timing line, or None if it is not one."""
+    if len(line) >= 29 and line[12:17] == ARROW and _is_fixed_timestamp(line, 0) and _is_fixed_timestamp(line, 17):
+        return _fixed_timestamp(line, 0), _fixed_timestamp(line, 17)
+
+    match = LOOSE_TIMING_RE.match(line)
+    if not match:
+        return None
+    h1, m1, s1, ms1, h2, m2, s2, ms2 = match.groups()
+    return (
+        int(h1) * 3600 + int(m1) * 60 + int(s1) + int(ms1.ljust(3, b"0")) / 1000,
+        int(h2) * 3600 + int(m2) * 60 + int(s2) + int(ms2.ljust(3, b"0")) / 1000,
+    )
+
+
+def _iter_lines(f, use_mmap: bool):
+    """Binary lines of f, from an mmap when possible (empty files can't be mapped)."""
+    if use_mmap:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return
+        with mapped:
+            yield from iter(mapped.readline, b"")
+    else:
+        yield from f
+
+
+def _iter_blocks(lines):
+    """Group lines into blank-line separated blocks: yields (first_line_number, [lines])."""
+    block, block_start = [], 0
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip(b"\r\n")
+        if number == 1 and line.startswith(BOM):
+            line = line[len(BOM):]
+        if not line.strip():
+            if block:
+                yield block_start, block
+                block = []
+            continue
+        if not block:
+            block_start = number
+        block.append(line)
+    if block:
+        yield block_start, block
+
+
+def _iter_raw_cues(path, errors, use_mmap):
+    """Yields (index, start, end, text) tuples; bad blocks go to errors."""
+    with open(path, "rb") as f:
+        position = 0
+        for block_start, block in _iter_blocks(_iter_lines(f, use_mmap)):
+            cue = None  # [index, start, end, text_lines] being filled
+            for offset, line in enumerate(block):
+                timing = parse_timing(line)
+                if timing is None:
+                    if cue is None:
+                        if offset == 0 and line.strip().isdigit():
+                            continue  # index line, timing must follow
+                        _report(errors, block_start + offset, "missing timing line", block)
+                        break
+                    cue[3].append(line)
+                    continue
+
+                # A timing line starts a cue; a digit line right before it is its index
+                index = None
+                if offset > 0 and block[offset - 1].strip().isdigit():
+                    index = int(block[offset - 1])
+                    if cue is not None and cue[3] and cue[3][-1] is block[offset - 1]:
+                        cue[3].pop()  # missing blank line: that digit line belonged to the next cue
+                if cue is not None:
+                    position += 1
+                    yield _finish(cue, position)
+                cue = [index, timing[0], timing[1], []]
+
+            if cue is not None:
+                position += 1
+                yield _finish(cue, position)
+
+
+def _finish(cue, position):
+    index, start, end, text_lines = cue
+    text = b"\n".join(text_lines).decode("utf-8", errors="replace")
+    return (index if index is not None else position), start, end, text
+
+
+def _report(errors, line_number, reason, block):
+    if errors is not None:
+        errors.append({
+            "line": line_number,
+            "reason": reason,
+            "block": b"\n".join(block).decode("utf-8", errors="replace")
+        })
+
+
+def iter_srt(path, errors: list = None, use_mmap: bool = True):
+    """
+    Lazily yield Subtitle cues from an SRT file.
+    Malformed blocks are skipped and appended to `errors` (if given) as
+    {line, reason, block} dicts.
+    """
+    for index, start, end, text in _iter_raw_cues(path, errors, use_mmap):
+        yield Subtitle(index, start, end, text)
+
+
+def parse_srt_columns(path, errors: list = None, use_mmap: bool = True) -> SubtitleColumns:
+    """Bulk mode: parse straight into the columnar arrays used by subtitles_rules.check_columns."""
+    index, start, end, chars, n_lines = [], [], [], [], []
+    line_lengths, line_cue = [], []
+    for position, (cue_index, cue_start, cue_end, text) in enumerate(_iter_raw_cues(path, errors, use_mmap)):
+        lines = text.splitlines()
+        index.append(cue_index)
+        start.append(cue_start)
+        end.append(cue_end)
+        chars.append(len(TAG_RE.sub("", text)))
+        n_lines.append(len(lines))
+        line_lengths.extend(len(line) for line in lines)
+        line_cue.extend([position] * len(lines))
+    return SubtitleColumns(index, start, end, chars, n_lines, line_lengths, line_cue)
+
+
+def parse_errors_to_issues(errors: list) -> list:
+    """Parse errors in the QC issue format, so reports show them next to rule violations."""
+    return [
+        {
+            "index": None,
+            "rule": "PARSE_ERROR",
+            "message": f"Line {error['line']}: {error['reason']}",
+            "severity": "ERROR"
+        }
+        for error in errors
+    ]
@@ -1,14 +1,21 @@
-import subprocess
 import datetime
 import os
 import re
+import json
 
-from faster_whisper import WhisperModel
+from faster_whisper import BatchedInferencePipeline
 # from pywhispercpp.model import Model
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database_api import save_srt_to_database, get_subtitles_by_criteria, initialize_subtitle_tables, search_segments_by_text, get_segment_by_id
 from qc_runner import run_qc
+from subtitles_rules import Subtitle, WordTimings, profile_hash
+from resegmenter import resegment
+from model_pool import get_model
+from media_utils import WHISPER_SAMPLE_RATE, decode_audio, extract_clip, extract_wav, extract_wavs, is_whisper_wav
+from transcription_cache import fingerprint, get_cache, make_key
+import pipeline_metrics
+import numpy as np
 
 # ------------------ CONFIG ------------------
 VIDEO_FOLDER = "./videos"
@@ -18,30 +25,38 @@ VIDEO_SEGMENTS_FOLDER = "./segments"
 # MODEL_PATH = "./models/ggml-large-v3-turbo.bin"
 MODEL_PATH = "base"
 VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".flv", ".wmv")
+KEEP_EXTRACTED_WAV = False  # persist the decoded 16kHz WAV when transcribing straight from a movie
+USE_TRANSCRIPTION_CACHE = True  # reuse SRTs of identical media + params (see transcription_cache.py)
+BATCH_SIZE = 0  # >0 decodes that many VAD chunks per forward pass (BatchedInferencePipeline), 0 = sequential
+BATCHED_MIN_AUDIO_SEC = 60.0  # shorter audio falls back to sequential decoding, batching doesn't pay off
+WORD_TIMESTAMPS = True  # request word timestamps, oversized segments are split on real word gaps
+CLIP_MARGIN_SEC = 1.0  # context added before/after a segment when cutting its clip
+CLIP_EXTRACT_MODE = "auto"  # auto | copy | smart | accurate (see media_utils.extract_clip)
+RESEGMENT_RULES_PATH = "./files/rules.json"  # cut output to this QC profile (resegmenter.py), None = legacy split
 
 
 # ------------------ UTILS ------------------
 
-def extract_audio(video_path: str, audio_folder: str) -> str:
-    """Extract audio from a video file and saves it as WAV with a timestamp."""
-    os.makedirs(audio_folder, exist_ok=True)
-
+def _timestamped_wav_path(video_path: str, audio_folder: str) -> str:
     filename = os.path.splitext(os.path.basename(video_path))[0]
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = os.path.join(audio_folder, f"{filename}_{timestamp}.wav")
-
-    command = [
-        "ffmpeg", "-y",
-        "-i", video_path,
-        "-vn",
-        "-acodec", "pcm_s16le",  # WAV PCM 16-bit
-        "-ar", "16000",          # sample rate 16kHz
-        "-ac", "1",              # mono
-        output_file
-    ]
+    return os.path.join(audio_folder, f"{filename}_{timestamp}.wav")
 
-    subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return output_file
+
+def _print_progress(label: str):
+    """media_utils on_progress callback printing one updating status line."""
+    def report(seconds, fraction):
+        done = f"{fraction:.0%}" if fraction is not None else f"{seconds:.0f}s"
+        print(f"\r⏳ {label}: {done}", end="" if fraction != 1.0 else "\n", flush=True)
+    return report
+
+
+def extract_audio(video_path: str, audio_folder: str, show_progress: bool = False) -> str:
+    """Extract audio from a video file and saves it as WAV (16kHz mono PCM 16-bit) with a timestamp."""
+    os.makedirs(audio_folder, exist_ok=True)
+    output_file = _timestamped_wav_path(video_path, audio_folder)
+    on_progress = _print_progress(os.path.basename(video_path)) if show_progress else None
+    return extract_wav(video_path, output_file, WHISPER_SAMPLE_RATE, on_progress)
 
 
 def format_timestamp(seconds: float) -> str:
@@ -63,9 +78,8 @@ def format_timestamp(seconds: float) -> str:
 
 
 def _filter_phantom_segments(segments, max_segment_duration: float = 10.0):
-    filtered_segments = []
     for segment in segments:
-        duration = (segment.t1 - segment.t0) / 100.0
+        duration = segment.end - segment.start
         text = segment.text.strip()
 
         if duration > max_segment_duration and len(text) < 20:
@@ -74,52 +88,137 @@ def _filter_phantom_segments(segments, max_segment_duration: float = 10.0):
         if not text or len(text) < 3:
             continue
 
-        filtered_segments.append(segment)
-    return filtered_segments
+        yield segment
 
 
-def _validate_segment_durations(segments, max_duration: float = 10.0):
-    return [seg for seg in segments if (seg.t1 - seg.t0) / 100.0 <= max_duration]
+def _compact_words(segments):
+    """Model segments -> Subtitles whose word timestamps are kept as compact WordTimings arrays."""
+    for segment in segments:
+        words = getattr(segment, "words", None)
+        if words and not isinstance(words, WordTimings):
+            segment = Subtitle(None, segment.start, segment.end, segment.text, WordTimings.from_words(words))
+        yield segment
+
+
+def _split_on_words(segment, first: int, last: int, max_duration: float):
+    """Split words [first, last) at the widest inter-word gap in the middle half until every part fits."""
+    words = segment.words
+    start = segment.start if first == 0 else words.start(first)
+    end = segment.end if last == len(words) else words.end(last - 1)
+    if end - start <= max_duration or last - first <= 1:
+        yield Subtitle(None, start, end, words.text(first, last), words.slice(first, last))
+        return
+
+    # Boundary k sits between word k-1 and word k
+    starts = words.starts[first + 1:last].astype(np.float64) + words.origin
+    ends = words.ends[first:last - 1].astype(np.float64) + words.origin
+    gaps = starts - ends
+    quarter = (end - start) / 4
+    middle = (ends >= start + quarter) & (starts <= end - quarter)
+    if middle.any():
+        k = int(np.argmax(np.where(middle, gaps, -np.inf)))
+    else:
+        k = int(np.argmin(np.abs((ends + starts) / 2 - (start + end) / 2)))
+    k += first + 1
+
+    yield from _split_on_words(segment, first, k, max_duration)
+    yield from _split_on_words(segment, k, last, max_duration)
 
 
 def _split_oversized_segments(segments, max_duration: float = 10.0):
-    result_segments = []
     for segment in segments:
-        duration = (segment.t1 - segment.t0) / 100.0
+        duration = segment.end - segment.start
         if duration <= max_duration:
-            result_segments.append(segment)
+            yield segment
+            continue
+
+        words = getattr(segment, "words", None)
+        if words is not None and len(words) > 1:
+            yield from _split_on_words(segment, 0, len(words), max_duration)
             continue
 
+        # No word timestamps: assume uniform duration per word, halve until every part fits
         words = segment.text.strip().split()
         if len(words) <= 1:
-            result_segments.append(segment)
+            yield segment
             continue
 
         mid_point = len(words) // 2
         duration_per_word = duration / len(words)
-        split_time = segment.t0 + (mid_point * duration_per_word * 100.0)
+        split_time = segment.start + mid_point * duration_per_word
 
-        class MockSegment:
-            def __init__(self, t0, t1, text):
-                self.t0 = t0
-                self.t1 = t1
-                self.text = text
+        yield from _split_oversized_segments([
+            Subtitle(None, segment.start, split_time, " ".join(words[:mid_point])),
+            Subtitle(None, split_time, segment.end, " ".join(words[mid_point:])),
+        ], max_duration)
 
-        first_half = MockSegment(segment.t0, split_time, " ".join(words[:mid_point]))
-        second_half = MockSegment(split_time, segment.t1, " ".join(words[mid_point:]))
 
-        result_segments.extend([first_half, second_half])
-
-    return result_segments
+def _format_srt_cue(number: int, segment) -> str:
+    start_ts = format_timestamp(segment.start)
+    end_ts = format_timestamp(segment.end)
+    return f"{number}\n{start_ts} --> {end_ts}\n{segment.text.strip()}\n"
 
 
 def _convert_segments_to_srt(segments):
-    srt_lines = []
-    for i, segment in enumerate(segments, start=1):
-        start_ts = format_timestamp(segment.t0 / 100.0)
-        end_ts = format_timestamp(segment.t1 / 100.0)
-        srt_lines.append(f"{i}\n{start_ts} --> {end_ts}\n{segment.text.strip()}\n")
-    return "\n".join(srt_lines)
+    return "\n".join(_format_srt_cue(i, segment) for i, segment in enumerate(segments, start=1))
+
+
+def _write_srt_cues(segments, srt_file) -> int:
+    """
+    Number and write each cue as soon as it is produced, flushing so a crash
+    leaves every finished cue on disk. Returns the number of cues written.
+    """
+    count = 0
+    for count, segment in enumerate(segments, start=1):
+        if count > 1:
+            srt_file.write("\n")
+        srt_file.write(_format_srt_cue(count, segment))
+        srt_file.flush()
+    return count
+
+
+_resegment_rules = {}  # rules path -> loaded profile (None if the file is missing)
+
+
+def load_resegment_rules(rules_path: str = RESEGMENT_RULES_PATH):
+    """The QC profile transcriptions are re-segmented to, or None for the legacy split."""
+    if not rules_path:
+        return None
+    if rules_path not in _resegment_rules:
+        rules = None
+        if os.path.isfile(rules_path):
+            with open(rules_path, "r", encoding="utf-8") as f:
+                rules = json.load(f)
+        else:
+            print(f"⚠️ Rules file {rules_path} not found, using the legacy segment split")
+        _resegment_rules[rules_path] = rules
+    return _resegment_rules[rules_path]
+
+
+def write_segments_to_srt(segments, output_srt: str, max_segment_duration: float = 10.0,
+                          audio_sec: float = None, rules: dict = None) -> int:
+    """
+    Post-process any iterable of segments (objects with start/end/text in seconds)
+    and stream the resulting cues to output_srt. Returns the number of cues written.
+    With rules, cues are re-segmented to satisfy that QC profile (using the
+    segments' word timestamps when present) instead of halved when too long.
+    """
+    # Decoding, post-processing and writing are interleaved; each stage is timed without its inputs
+    segments = pipeline_metrics.timed_iter("decoding", segments, audio_sec=audio_sec)
+
+    # Post-processing, streamed cue by cue (memory stays flat for long inputs)
+    # Long segments are split (never dropped): on word timestamps, or re-cut to the rules profile
+    filtered_segments = _filter_phantom_segments(_compact_words(segments), max_segment_duration)
+    if rules is not None:
+        final_segments = resegment(filtered_segments, rules)
+    else:
+        final_segments = _split_oversized_segments(filtered_segments, max_segment_duration)
+    final_segments = pipeline_metrics.timed_iter("postprocess", final_segments, inner=segments)
+
+    with pipeline_metrics.stage("srt_write", inner=final_segments, output=output_srt):
+        with open(output_srt, "w", encoding="utf-8") as f:
+            return _write_srt_cues(final_segments, f)
+
 
 def _select_srt_file(default_latest=True):
     """
@@ -183,48 +282,199 @@ def _select_srt_file(default_latest=True):
 #
 #     return output_srt
 
+def _transcription_cache_key(source, model_path, language, translate, max_segment_duration, compute_type,
+                             batch_size=0, rules=None, word_timestamps=False, decode_options=None) -> str:
+    """
+    Cache key: media content (path or decoded array) x everything that changes the SRT.
+    decode_options: non-default beam_size/vad_filter; left out when unset so existing entries stay valid.
+    """
+    return make_key(
+        fingerprint(source),
+        model=model_path,
+        language=language,
+        translate=translate,
+        max_segment_duration=max_segment_duration,
+        compute_type=compute_type,
+        batched=bool(batch_size),
+        resegment_rules=profile_hash(rules) if rules is not None else None,
+        word_timestamps=word_timestamps,
+        **(decode_options or {})
+    )
+
+
+def media_cache_key(media_path: str, model_path: str = MODEL_PATH, language: str = "rs", translate: bool = False,
+                    max_segment_duration: float = 10.0, compute_type: str = "default", batch_size: int = BATCH_SIZE,
+                    rules_path: str = RESEGMENT_RULES_PATH, word_timestamps: bool = WORD_TIMESTAMPS) -> str:
+    """Cache key transcribe_media_to_srt uses for a media file (keyed on the file, not its decoded audio)."""
+    rules = load_resegment_rules(rules_path)
+    return _transcription_cache_key(media_path, model_path, language, translate, max_segment_duration,
+                                    compute_type, batch_size, rules, word_timestamps or rules is not None)
+
+
+def restore_cached_srt(cache_key: str, output_srt: str) -> bool:
+    """Write the cached SRT to output_srt; False on a cache miss."""
+    srt_content = get_cache().get(cache_key)
+    if srt_content is None:
+        return False
+    with open(output_srt, "w", encoding="utf-8") as f:
+        f.write(srt_content)
+    return True
+
+
 def transcribe_to_srt_cuda(
-    audio_path: str,
+    audio_path,
     model_path: str = MODEL_PATH,
     output_srt: str = None,
     language: str = "rs",
     translate: bool = False,
     max_segment_duration: float = 10.0,
-    device: str = "cuda"
+    device: str = "cuda",
+    compute_type: str = "default",
+    cpu_threads: int = 0,
+    use_cache: bool = USE_TRANSCRIPTION_CACHE,
+    batch_size: int = BATCH_SIZE,
+    rules_path: str = RESEGMENT_RULES_PATH,
+    word_timestamps: bool = WORD_TIMESTAMPS,
+    beam_size: int = None,
+    vad_filter: bool = None
 ) -> str:
-
+    """
+    Transcribe audio to SRT.
+
+    audio_path can be a file path or an already decoded float32 16kHz mono
+    array (see media_utils.decode_audio); arrays require output_srt.
+    batch_size > 0 selects batched decoding for audio of at least BATCHED_MIN_AUDIO_SEC.
+    rules_path: QC profile the cues are re-segmented to (word timestamps are requested), None = legacy split.
+    word_timestamps: split/re-segment on real word boundaries instead of interpolated times.
+    beam_size, vad_filter: None = faster-whisper's default for the decoding path (VAD is on when batched).
+    """
     if output_srt is None:
+        if not isinstance(audio_path, str):
+            raise ValueError("output_srt is required when transcribing a decoded audio array")
         os.makedirs(SUBTITLES_FOLDER, exist_ok=True)
         filename = os.path.splitext(os.path.basename(audio_path))[0]
         output_srt = os.path.join(SUBTITLES_FOLDER, filename + ".srt")
 
-    # Load model with CUDA
-    model = WhisperModel(
-        model_path,
-        device=device,
-        n_threads=0  # let GPU handle it
-    )
+    rules = load_resegment_rules(rules_path)
+    word_timestamps = word_timestamps or rules is not None
+    decode_options = {name: value for name, value in (("beam_size", beam_size), ("vad_filter", vad_filter))
+                      if value is not None}
+    cache_key = None
+    if use_cache:
+        cache_key = _transcription_cache_key(audio_path, model_path, language, translate, max_segment_duration,
+                                             compute_type, batch_size, rules, word_timestamps, decode_options)
+        if restore_cached_srt(cache_key, output_srt):
+            return output_srt
+
+    # Duration decides batched vs sequential, so decode up front; a prepared 16kHz mono WAV is
+    # memory-mapped as is (no decode/resample in ffmpeg or faster-whisper)
+    if isinstance(audio_path, str) and (batch_size or is_whisper_wav(audio_path)):
+        audio_path = decode_audio(audio_path)
+    if batch_size and len(audio_path) / WHISPER_SAMPLE_RATE < BATCHED_MIN_AUDIO_SEC:
+        batch_size = 0
+
+    # Warm model from the process-wide pool (loaded once per model/device/compute_type/threads)
+    with pipeline_metrics.stage("model_load", model=model_path):
+        model = get_model(
+            model_path,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads  # 0 = let CTranslate2 decide
+        )
 
-    # IMPORTANT: unpack result
-    segments, info = model.transcribe(
-        audio_path,
-        language=language,
-        translate=translate,
-        no_context=True
-    )
+    # IMPORTANT: unpack result (segments is a lazy generator, decoding happens while we iterate)
+    # transcribe() itself runs audio loading, features, language detection and VAD when enabled
+    # (always when batched, only with vad_filter on the sequential path), hence not called "vad"
+    vad_on = bool(batch_size) if vad_filter is None else vad_filter
+    with pipeline_metrics.stage("transcribe_setup", batch_size=batch_size, vad_filter=vad_on) as metrics:
+        if batch_size:
+            # Batched windows are decoded independently, there is no previous-text context
+            segments, info = BatchedInferencePipeline(model=model).transcribe(
+                audio_path,
+                language=language,
+                task="translate" if translate else "transcribe",
+                batch_size=batch_size,
+                word_timestamps=word_timestamps,
+                **decode_options
+            )
+        else:
+            segments, info = model.transcribe(
+                audio_path,
+                language=language,
+                task="translate" if translate else "transcribe",
+                condition_on_previous_text=False,  # no context carried between windows
+                word_timestamps=word_timestamps,  # real word boundaries for splitting / the re-segmenter
+                **decode_options
+            )
+        metrics["audio_sec"] = info.duration
+
+    write_segments_to_srt(segments, output_srt, max_segment_duration, audio_sec=info.duration, rules=rules)
 
-    # Convert generator → list
-    raw_segments = list(segments)
+    if cache_key:
+        get_cache().put_file(cache_key, output_srt)
 
-    # Post-processing
-    filtered_segments = _filter_phantom_segments(raw_segments, max_segment_duration)
-    validated_segments = _validate_segment_durations(filtered_segments, max_segment_duration)
-    final_segments = _split_oversized_segments(validated_segments, max_segment_duration)
+    return output_srt
 
-    srt_content = _convert_segments_to_srt(final_segments)
 
-    with open(output_srt, "w", encoding="utf-8") as f:
-        f.write(srt_content)
+def transcribe_media_to_srt(
+    media_path: str,
+    model_path: str = MODEL_PATH,
+    output_srt: str = None,
+    language: str = "rs",
+    translate: bool = False,
+    max_segment_duration: float = 10.0,
+    device: str = "cuda",
+    compute_type: str = "default",
+    cpu_threads: int = 0,
+    use_cache: bool = USE_TRANSCRIPTION_CACHE,
+    batch_size: int = BATCH_SIZE,
+    rules_path: str = RESEGMENT_RULES_PATH,
+    word_timestamps: bool = WORD_TIMESTAMPS,
+    keep_wav: bool = KEEP_EXTRACTED_WAV,
+    audio_folder: str = AUDIO_FOLDER
+) -> str:
+    """
+    Decode a movie/audio file through an ffmpeg pipe and transcribe it,
+    without writing an intermediate WAV unless keep_wav is set.
+    The cache is checked against the source file, so a hit skips ffmpeg too.
+    """
+    filename = os.path.splitext(os.path.basename(media_path))[0]
+    if output_srt is None:
+        os.makedirs(SUBTITLES_FOLDER, exist_ok=True)
+        output_srt = os.path.join(SUBTITLES_FOLDER, filename + ".srt")
+
+    cache_key = None
+    if use_cache:
+        cache_key = media_cache_key(media_path, model_path, language, translate, max_segment_duration,
+                                    compute_type, batch_size, rules_path, word_timestamps)
+        if restore_cached_srt(cache_key, output_srt):
+            return output_srt
+
+    save_wav = None
+    if keep_wav:
+        os.makedirs(audio_folder, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        save_wav = os.path.join(audio_folder, f"{filename}_{timestamp}.wav")
+
+    audio = decode_audio(media_path, save_wav=save_wav)
+    transcribe_to_srt_cuda(
+        audio,
+        model_path=model_path,
+        output_srt=output_srt,
+        language=language,
+        translate=translate,
+        max_segment_duration=max_segment_duration,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        batch_size=batch_size,
+        rules_path=rules_path,
+        word_timestamps=word_timestamps,
+        use_cache=False  # keyed on the source file below, hashing the decoded array would be redundant
+    )
+
+    if cache_key:
+        get_cache().put_file(cache_key, output_srt)
 
     return output_srt
 
@@ -262,26 +512,35 @@ def list_subtitles(folder=SUBTITLES_FOLDER) -> list[str]:
     ]
 
 
+# Common patterns for season/episode detection (matched against the lower-cased name)
+SEASON_EPISODE_PATTERNS = [re.compile(pattern) for pattern in (
+    r's(\d{1,2})e(\d{1,2})',                          # S01E01, s01e01, S1E1
+    r'season\s*(\d{1,2})\s*episode\s*(\d{1,2})',       # Season 1 Episode 1, season 01 episode 01
+    r'(\d{1,2})x(\d{1,2})',                           # 1x01, 01x01
+    r'[\-_](\d{1,2})[\-_](\d{1,2})[\-_]',                # Just numbers like _01_01_ or -01-01-
+)]
+
+# Patterns removed from a name to get its title (season/episode indicators, dates)
+TITLE_REMOVAL_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r's\d{1,2}e\d{1,2}',                               # S01E01, s01e01, S1E1 variants
+    r'season\s*\d{1,2}\s*episode\s*\d{1,2}',            # Season X Episode Y variants
+    r'\d{1,2}x\d{1,2}',                                # 1x01, 01x01 variants
+    r'[\-_]\d{1,2}[\-_]\d{1,2}[\-_]',                     # Isolated season/episode numbers with separators
+    r'\d{8}_\d{6}',                                    # YYYYMMDD_HHMMSS format
+    r'\d{4}-\d{2}-\d{2}',                              # YYYY-MM-DD format
+)]
+_SEPARATORS = re.compile(r'[\-_]+')
+_SPACES = re.compile(r'\s+')
+
+
 def extract_season_episode_from_filename(filename):
     """Extract season and episode numbers from filename using common patterns."""
     
     # Get just the filename without path and extension
     base_filename = os.path.splitext(os.path.basename(filename))[0].lower()
     
-    # Common patterns for season/episode detection
-    patterns = [
-        # S01E01, s01e01, S1E1
-        r's(\d{1,2})e(\d{1,2})',
-        # Season 1 Episode 1, season 01 episode 01
-        r'season\s*(\d{1,2})\s*episode\s*(\d{1,2})',
-        # 1x01, 01x01
-        r'(\d{1,2})x(\d{1,2})',
-        # Just numbers like _01_01_ or -01-01-
-        r'[\-_](\d{1,2})[\-_](\d{1,2})[\-_]',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, base_filename)
+    for pattern in SEASON_EPISODE_PATTERNS:
+        match = pattern.search(base_filename)
         if match:
             season = int(match.group(1))
             episode = int(match.group(2))
@@ -296,32 +555,15 @@ def extract_title_from_filename(filename):
     # Get just the filename without path and extension
     base_filename = os.path.splitext(os.path.basename(filename))[0]
     
-    # Patterns to remove (season/episode indicators)
-    removal_patterns = [
-        # S01E01, s01e01, S1E1 variants
-        r's\d{1,2}e\d{1,2}',
-        r'S\d{1,2}E\d{1,2}',
-        # Season X Episode Y variants
-        r'season\s*\d{1,2}\s*episode\s*\d{1,2}',
-        r'Season\s*\d{1,2}\s*Episode\s*\d{1,2}',
-        # 1x01, 01x01 variants
-        r'\d{1,2}x\d{1,2}',
-        # Isolated season/episode numbers with separators
-        r'[\-_]\d{1,2}[\-_]\d{1,2}[\-_]',
-        # Timestamps or dates
-        r'\d{8}_\d{6}',  # YYYYMMDD_HHMMSS format
-        r'\d{4}-\d{2}-\d{2}',  # YYYY-MM-DD format
-    ]
-    
     # Remove season/episode patterns
     clean_title = base_filename
-    for pattern in removal_patterns:
-        clean_title = re.sub(pattern, '', clean_title, flags=re.IGNORECASE)
+    for pattern in TITLE_REMOVAL_PATTERNS:
+        clean_title = pattern.sub('', clean_title)
     
     # Clean up separators and extra spaces
-    clean_title = re.sub(r'[\-_]+', ' ', clean_title)  # Replace dashes/underscores with spaces
-    clean_title = re.sub(r'\s+', ' ', clean_title)     # Replace multiple spaces with single space
-    clean_title = clean_title.strip()                  # Remove leading/trailing spaces
+    clean_title = _SEPARATORS.sub(' ', clean_title)  # Replace dashes/underscores with spaces
+    clean_title = _SPACES.sub(' ', clean_title)      # Replace multiple spaces with single space
+    clean_title = clean_title.strip()                # Remove leading/trailing spaces
     
     # Convert to title case for better presentation
     clean_title = clean_title.title()
@@ -329,49 +571,59 @@ def extract_title_from_filename(filename):
     return clean_title if clean_title else None
 
 
+def media_basename_for_srt(srt_path: str) -> str:
+    """Media file name (no extension) an SRT was generated from: its name without the run timestamp."""
+    srt_basename = os.path.splitext(os.path.basename(srt_path))[0]
+
+    # Remove timestamp pattern (YYYY_MM_DD_HH_MM_SS or YYYYMMDD_HHMMSS)
+    media_basename = re.sub(r'_\d{4}[-_]?\d{2}[-_]?\d{2}[-_]?\d{2}[-_]?\d{2}[-_]?\d{2}$', '', srt_basename)
+    # Also handle YYYYMMDD_HHMMSS format
+    return re.sub(r'_\d{8}_\d{6}$', '', media_basename)
+
+
 def find_video_file_for_segment(segment_data):
-    """Find matching video file based on segment subtitle metadata."""
+    """Find matching video file based on segment subtitle metadata (media_catalog.py lookups)."""
+    from media_catalog import get_catalog
+
     (segment_id, subtitle_id, time_start, time_end, text, segment_number,
      video_title, season, episode, series, music_title, language, filename) = segment_data
     
-    videos = list_videos()
-    if not videos:
-        return None
+    catalog = get_catalog(VIDEO_FOLDER)
     
     # First try to match by stored filename (most reliable)
     if filename:
-        for video_path in videos:
-            video_filename = os.path.basename(video_path)
-            # Remove extension for comparison
-            stored_name = os.path.splitext(filename)[0] if filename else ""
-            current_name = os.path.splitext(video_filename)[0]
-            
-            if stored_name and stored_name.lower() == current_name.lower():
-                return video_path
+        video_path = catalog.find_by_filename(filename)
+        if video_path:
+            return video_path
     
     # Fallback to metadata-based matching
-    for video_path in videos:
-        video_filename = os.path.basename(video_path)
-        
-        # Extract info from video filename
-        video_season, video_episode = extract_season_episode_from_filename(video_filename)
-        video_series_title = extract_title_from_filename(video_filename)
-        
-        # Match by series + season + episode (most specific)
-        if series and season and episode:
-            if (video_series_title and series.lower() in video_series_title.lower() and
-                str(video_season).zfill(2) == str(season).zfill(2) and
-                str(video_episode).zfill(2) == str(episode).zfill(2)):
-                return video_path
-        
-        # Match by video title (for standalone videos)
-        if video_title and video_series_title:
-            if video_title.lower() in video_series_title.lower():
-                return video_path
+    if series and season and episode:
+        video_path = catalog.find_episode(series, season, episode)
+        if video_path:
+            return video_path
+    if video_title:
+        return catalog.find_by_title(video_title)
     
     return None
 
 
+def segment_clip_filename(segment_data, label, extension: str = ".avi") -> str:
+    """Descriptive, filesystem-safe clip file name for a segment row; label makes it unique."""
+    (segment_id, subtitle_id, time_start, time_end, text, segment_number,
+     video_title, season, episode, series, music_title, language, filename) = segment_data
+
+    # Create descriptive filename
+    if series and season and episode:
+        filename = f"{series.replace(' ', '_')}_S{season}E{episode}_segment_{label}{extension}"
+    elif video_title:
+        filename = f"{video_title.replace(' ', '_')}_segment_{label}{extension}"
+    else:
+        filename = f"segment_{label}{extension}"
+
+    # Clean filename
+    return re.sub(r'[<>:"/\\|?*]', '_', filename)  # Remove invalid characters
+
+
 def convert_srt_time_to_seconds(srt_time):
     """Convert SRT timestamp (hh:mm:ss,mmm) to seconds."""
     time_parts = srt_time.replace(',', '.').split(':')
@@ -381,44 +633,37 @@ def convert_srt_time_to_seconds(srt_time):
     return hours * 3600 + minutes * 60 + seconds
 
 
-def extract_video_segment(video_path: str, start_time: float, end_time: float, output_path: str) -> str:
-    """Extract a video segment using ffmpeg."""
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    # Calculate duration instead of using absolute end time
-    duration = end_time - start_time
-
-    command = [
-        "ffmpeg", "-y",
-        "-i", video_path,
-        "-ss", str(start_time),
-        "-t", str(duration),
-        "-c:v", "libx264",
-        "-c:a", "aac",
-        "-crf", "23",
-        "-preset", "fast",
-        output_path
-    ]
-
-    subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return output_path
+def extract_video_segment(video_path: str, start_time: float, end_time: float, output_path: str,
+                          mode: str = CLIP_EXTRACT_MODE) -> str:
+    """Extract a video segment using ffmpeg (input-side seek; stream copy / smart cut, see media_utils.extract_clip)."""
+    return extract_clip(video_path, start_time, end_time, output_path, mode)
 
 
 # ------------------ MENU ACTIONS ------------------
 
 def option_extract_wav():
-    """Extract WAV from all videos in VIDEO_FOLDER."""
+    """Extract WAV from all videos in VIDEO_FOLDER (several ffmpeg processes at once)."""
     videos = list_videos()
     if not videos:
         print(f"⚠️ No video files found in {VIDEO_FOLDER}")
         return
-    for video_file in videos:
-        print(f"Processing: {video_file}")
+    if len(videos) == 1:
+        print(f"Processing: {videos[0]}")
         try:
-            output = extract_audio(video_file, AUDIO_FOLDER)
+            output = extract_audio(videos[0], AUDIO_FOLDER, show_progress=True)
             print(f"✅ Extracted audio: {output}")
         except Exception as e:
-            print(f"❌ Failed for {video_file}: {e}")
+            print(f"❌ Failed for {videos[0]}: {e}")
+        return
+
+    os.makedirs(AUDIO_FOLDER, exist_ok=True)
+    print(f"Processing {len(videos)} videos...")
+    jobs = [(video_file, _timestamped_wav_path(video_file, AUDIO_FOLDER)) for video_file in videos]
+    for (video_file, _), output in zip(jobs, extract_wavs(jobs)):
+        if isinstance(output, BaseException):
+            print(f"❌ Failed for {video_file}: {output}")
+        else:
+            print(f"✅ Extracted audio: {output}")
 
 
 def option_wav_to_srt():
@@ -450,7 +695,7 @@ def option_wav_to_srt():
 
 
 def option_movie_to_srt():
-    """Extract WAV + Transcribe to SRT from a chosen movie in VIDEO_FOLDER."""
+    """Transcribe a chosen movie in VIDEO_FOLDER to SRT (audio streamed from ffmpeg, no WAV unless KEEP_EXTRACTED_WAV)."""
     videos = list_videos()
     if not videos:
         print(f"⚠️ No video files found in {VIDEO_FOLDER}")
@@ -471,12 +716,8 @@ def option_movie_to_srt():
             print("⚠️ Invalid choice.")
             return
     try:
-        wav_path = extract_audio(video_path, AUDIO_FOLDER)
-        print("CWD:", os.getcwd())
-        print("Audio path:", wav_path)
-        print("Exists:", os.path.exists(wav_path))
-        print(f"✅ Extracted audio: {wav_path}")
-        output_srt = transcribe_to_srt_cuda(wav_path)
+        with pipeline_metrics.stage("movie_to_srt_total", source=video_path):
+            output_srt = transcribe_media_to_srt(video_path)
         print(f"✅ Transcript saved: {output_srt}")
         
         # Store video filename for future reference
@@ -614,11 +855,7 @@ def option_save_srt_to_database():
     
     # Generate video filename automatically from SRT filename (remove timestamp)
     srt_basename = os.path.splitext(os.path.basename(srt_path))[0]
-    
-    # Remove timestamp pattern (YYYY_MM_DD_HH_MM_SS or YYYYMMDD_HHMMSS)
-    media_basename = re.sub(r'_\d{4}[-_]?\d{2}[-_]?\d{2}[-_]?\d{2}[-_]?\d{2}[-_]?\d{2}$', '', srt_basename)
-    # Also handle YYYYMMDD_HHMMSS format
-    media_basename = re.sub(r'_\d{8}_\d{6}$', '', media_basename)
+    media_basename = media_basename_for_srt(srt_path)
     
     print(f"\n📁 Auto-generating video filename from SRT: '{srt_basename}' → '{media_basename}'")
     
@@ -631,19 +868,22 @@ def option_save_srt_to_database():
     print(f"📄 Video filename will be: {video_filename}")
 
     try:
-        subtitle_id = save_srt_to_database(
-            srt_file_path=srt_path,
-            video_title=video_title,
-            season=season,
-            episode=episode,
-            series=series,
-            music_title=music_title,
-            language=language,
-            filename=video_filename
-        )
+        with pipeline_metrics.stage("db_insert", source=srt_path):
+            subtitle_id = save_srt_to_database(
+                srt_file_path=srt_path,
+                video_title=video_title,
+                season=season,
+                episode=episode,
+                series=series,
+                music_title=music_title,
+                language=language,
+                filename=video_filename
+            )
         
         if subtitle_id:
             print(f"🎯 Subtitle saved to database with ID: {subtitle_id}")
+            _index_saved_subtitle(subtitle_id, srt_path, video_title, season, episode, series, music_title,
+                                  language, video_filename)
         else:
             print("❌ Failed to save subtitle to database")
             
@@ -651,8 +891,49 @@ def option_save_srt_to_database():
         print(f"❌ Error: {e}")
 
 
+def _index_saved_subtitle(subtitle_id, srt_path, video_title, season, episode, series, music_title, language,
+                          filename):
+    """Keep the local full-text index in step with the database (see segment_index.py)."""
+    from segment_index import SegmentIndex
+
+    try:
+        with SegmentIndex() as index:
+            count = index.index_srt_file(subtitle_id, srt_path, video_title, season, episode, series,
+                                         music_title, language, filename)
+        print(f"🔎 Indexed {count} segments for search")
+    except Exception as e:
+        print(f"⚠️ Search index not updated: {e}")
+
+
+def _print_segment_result(result):
+    (segment_id, subtitle_id, time_start, time_end, text, segment_number,
+     video_title, season, episode, series, music_title, language, filename) = result
+
+    print(f"\n📺 Segment #{segment_number} ({time_start} → {time_end}):")
+    print(f"    💬 \"{text}\"")
+
+    # Show subtitle context
+    if series:
+        context = f"{series}"
+        if season: context += f" S{season}"
+        if episode: context += f"E{episode}"
+    elif video_title:
+        context = video_title
+    elif music_title:
+        context = f"🎵 {music_title}"
+    else:
+        context = "Unknown"
+
+    print(f"    🎬 From: {context} ({language})")
+    # Segments indexed straight from an SRT have no database ID yet: option 6 takes subtitle_id#segment_number
+    reference = segment_id if segment_id else f"{subtitle_id}#{segment_number}"
+    print(f"    🆔 Subtitle ID: {subtitle_id} | Segment ID: {reference}")
+
+
 def option_search_segments():
-    """Search segments by text content"""
+    """Search segments by text content (local full-text index, database if it can't be built)"""
+    from segment_index import open_search_index
+
     print("\n🔍 Search subtitle segments by text:")
     print("Enter any word or phrase to find in subtitle segments")
     
@@ -662,6 +943,23 @@ def option_search_segments():
         return
     
     try:
+        index = open_search_index()
+        if index is not None:
+            with index:
+                phrase = len(search_text.split()) > 1
+                page = 1
+                while True:
+                    result = index.search(search_text, page=page, phrase=phrase, prefix=True)
+                    if not result.total:
+                        print(f"📭 No segments found containing: '{search_text}'")
+                        return
+                    print(f"\n🔍 Found {result.total} matching segments (page {result.page}/{result.pages}):")
+                    for row in result.rows:
+                        _print_segment_result(row)
+                    if not result.has_next or input("\nEnter = next page, q = stop: ").strip().lower() == "q":
+                        return
+                    page += 1
+
         results = search_segments_by_text(search_text)
         
         if not results:
@@ -671,26 +969,7 @@ def option_search_segments():
         print(f"\n🔍 Found {len(results)} matching segments:")
         
         for result in results:
-            (segment_id, subtitle_id, time_start, time_end, text, segment_number,
-             video_title, season, episode, series, music_title, language, filename) = result
-            
-            print(f"\n📺 Segment #{segment_number} ({time_start} → {time_end}):")
-            print(f"    💬 \"{text}\"")
-            
-            # Show subtitle context
-            if series:
-                context = f"{series}"
-                if season: context += f" S{season}"
-                if episode: context += f"E{episode}"
-            elif video_title:
-                context = video_title
-            elif music_title:
-                context = f"🎵 {music_title}"
-            else:
-                context = "Unknown"
-            
-            print(f"    🎬 From: {context} ({language})")
-            print(f"    🆔 Subtitle ID: {subtitle_id}")
+            _print_segment_result(result)
             
     except Exception as e:
         print(f"❌ Search error: {e}")
@@ -700,20 +979,30 @@ def option_extract_video_segment():
     """Extract video segment by segment ID"""
     print("\n🎬 Extract video segment by segment ID:")
     
-    segment_id_input = input("Enter segment ID: ").strip()
+    segment_id_input = input("Enter segment ID (or subtitle_id#segment_number from search): ").strip()
     if not segment_id_input:
         print("⚠️ Segment ID is required.")
         return
     
     try:
-        segment_id = int(segment_id_input)
+        if "#" in segment_id_input:
+            subtitle_ref, number_ref = (int(part) for part in segment_id_input.split("#", 1))
+        else:
+            segment_id = int(segment_id_input)
     except ValueError:
-        print("⚠️ Segment ID must be a valid integer.")
+        print("⚠️ Segment ID must be a valid integer (or subtitle_id#segment_number).")
         return
     
     try:
-        # Get segment data from database
-        segment_data = get_segment_by_id(segment_id)
+        if "#" in segment_id_input:
+            # Indexed from an SRT without a database segment ID yet: the search index has the row
+            from segment_index import SegmentIndex
+            with SegmentIndex() as index:
+                segment_data = index.get_segment(subtitle_ref, number_ref)
+            segment_id = f"{subtitle_ref}-{number_ref}"  # label for messages and the clip name
+        else:
+            # Get segment data from database
+            segment_data = get_segment_by_id(segment_id)
         
         if not segment_data:
             print(f"❌ Segment with ID {segment_id} not found in database.")
@@ -758,7 +1047,7 @@ def option_extract_video_segment():
         end_seconds = convert_srt_time_to_seconds(time_end)
         
         # Add n second margins before and after
-        margin_seconds = 1 # TODO this can be a config setting const
+        margin_seconds = CLIP_MARGIN_SEC
         start_with_margin = max(0, start_seconds - margin_seconds)  # Don't go below 0
         end_with_margin = end_seconds + margin_seconds
         
@@ -774,16 +1063,7 @@ def option_extract_video_segment():
         os.makedirs(VIDEO_SEGMENTS_FOLDER, exist_ok=True)
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        # Create descriptive filename
-        if series and season and episode:
-            filename = f"{series.replace(' ', '_')}_S{season}E{episode}_segment_{segment_id}_{timestamp}.avi"
-        elif video_title:
-            filename = f"{video_title.replace(' ', '_')}_segment_{segment_id}_{timestamp}.avi"
-        else:
-            filename = f"segment_{segment_id}_{timestamp}.avi"
-        
-        # Clean filename
-        filename = re.sub(r'[<>:"/\\|?*]', '_', filename)  # Remove invalid characters
+        filename = segment_clip_filename(segment_data, f"{segment_id}_{timestamp}")
         output_path = os.path.join(VIDEO_SEGMENTS_FOLDER, filename)
         
         print(f"\n🎬 Extracting segment...")
@@ -818,6 +1098,51 @@ def option_run_qc():
         print(f"Subtitle #{i['index']} | {i['rule']} | {i['message']}")
 
 
+def option_run_qc_corpus():
+    """Run QC over every SRT under SUBTITLES_FOLDER in parallel and print the summary."""
+    from qc_runner import find_srt_files, run_qc_corpus
+
+    srt_paths = find_srt_files(SUBTITLES_FOLDER)
+    if not srt_paths:
+        print(f"⚠️ No SRT files found in {SUBTITLES_FOLDER}")
+        return
+
+    report = run_qc_corpus(srt_paths)
+    print(f"\n📊 {report['files']} files | {report['files_with_issues']} with issues | "
+          f"{report['total_issues']} issues | {report['timing']['wall_sec']}s")
+    for rule, count in report["issues_per_rule"].items():
+        print(f"    {rule}: {count}")
+    for offender in report["worst_offenders"][:5]:
+        print(f"    ❌ {offender['path']} ({offender['issues']} issues)")
+
+
+def option_export_search_clips():
+    """Export a clip for every segment matching a text search (one ffmpeg run per source video)."""
+    from clip_exporter import export_clips, segments_for_query
+
+    search_text = input("Enter search text: ").strip()
+    if not search_text:
+        print("⚠️ Search text is required.")
+        return
+
+    segments = segments_for_query(search_text)
+    if not segments:
+        print(f"📭 No segments found containing: '{search_text}'")
+        return
+
+    output_folder = os.path.join(VIDEO_SEGMENTS_FOLDER, datetime.datetime.now().strftime("export_%Y%m%d_%H%M%S"))
+    manifest = export_clips(segments, output_folder)
+    failed = sum(1 for clip in manifest["clips"] if clip.get("error"))
+    print(f"✅ {len(manifest['clips']) - failed} clips exported to {output_folder} ({failed} failed)")
+
+
+def option_batch_transcribe():
+    """Extract + transcribe every video in VIDEO_FOLDER and every WAV in AUDIO_FOLDER."""
+    from batch_transcriber import run_batch
+
+    run_batch()
+
+
 # ------------------ MAIN ------------------
 
 def main():
@@ -825,11 +1150,14 @@ def main():
         print("\n🎬 Whisper Automation Menu:")
         print("1 - Extract WAV from all movies in folder")
         print("2 - Convert a WAV to SRT")
-        print("3 - Create SRT directly from a movie (extract + transcribe)")
+        print("3 - Create SRT directly from a movie (stream audio + transcribe)")
         print("4 - Save SRT file to database")
         print("5 - Search segments by text")
         print("6 - Extract video segment by segment ID")
         print("7 - Run subtitle QC on SRT")
+        print("8 - Batch transcribe all videos/WAVs in folders")
+        print("9 - Run subtitle QC on all SRTs in folder")
+        print("10 - Export clips for all segments matching a search")
         print("0 - Exit\n")
 
         choice = input("Select option: ").strip()
@@ -848,6 +1176,12 @@ def main():
             option_extract_video_segment()
         elif choice == "7":
             option_run_qc()
+        elif choice == "8":
+            option_batch_transcribe()
+        elif choice == "9":
+            option_run_qc_corpus()
+        elif choice == "10":
+            option_export_search_clips()
         elif choice == "0":
             print("👋 Exiting...")
             break
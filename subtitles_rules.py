@@ -1,15 +1,110 @@
 # subtitles_rules.py
 
+import hashlib
+import json
 import re
+from functools import cached_property
 from typing import List, Dict
 
+import numpy as np
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+class WordTimings:
+    """
+    Compact word timestamps of one cue: float32 start/end offsets relative to
+    `origin` plus all words in one string sliced by int32 bounds, instead of
+    one object per word.
+    """
+
+    __slots__ = ("origin", "starts", "ends", "bounds", "words_text")
+
+    def __init__(self, origin, starts, ends, bounds, words_text):
+        self.origin = origin
+        self.starts = starts
+        self.ends = ends
+        self.bounds = bounds
+        self.words_text = words_text
+
+    @classmethod
+    def from_words(cls, words, offset: float = 0.0):
+        """From faster-whisper Word objects (start/end/word); offset shifts them to global time."""
+        words = [word for word in words if word.word.strip()]
+        if not words:
+            return None
+        origin = words[0].start + offset
+        texts = [word.word.strip() for word in words]
+        bounds = np.zeros(len(texts) + 1, dtype=np.int32)
+        np.cumsum([len(text) for text in texts], out=bounds[1:])
+        return cls(
+            origin,
+            np.array([word.start + offset - origin for word in words], dtype=np.float32),
+            np.array([word.end + offset - origin for word in words], dtype=np.float32),
+            bounds,
+            "".join(texts),
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def word(self, i: int) -> str:
+        return self.words_text[self.bounds[i]:self.bounds[i + 1]]
+
+    def start(self, i: int) -> float:
+        return self.origin + float(self.starts[i])
+
+    def end(self, i: int) -> float:
+        return self.origin + float(self.ends[i])
+
+    def __iter__(self):
+        """(start, end, word) in global seconds."""
+        origin, bounds, words_text = self.origin, self.bounds.tolist(), self.words_text
+        for i, (start, end) in enumerate(zip(self.starts.tolist(), self.ends.tolist())):
+            yield origin + start, origin + end, words_text[bounds[i]:bounds[i + 1]]
+
+    def text(self, first: int = 0, last: int = None) -> str:
+        last = len(self) if last is None else last
+        return " ".join(self.word(i) for i in range(first, last))
+
+    def slice(self, first: int, last: int) -> "WordTimings":
+        """Words [first, last) as their own WordTimings (offsets rebased)."""
+        shift = self.starts[first]
+        bounds = self.bounds[first:last + 1]
+        return WordTimings(
+            self.origin + float(shift),
+            self.starts[first:last] - shift,
+            self.ends[first:last] - shift,
+            bounds - bounds[0],
+            self.words_text[bounds[0]:bounds[-1]],
+        )
+
 
 class Subtitle:
-    def __init__(self, index, start, end, text):
+    """
+    Shared cue type: parsed SRT cues, post-processed transcription segments
+    and everything the SRT writer emits. Slotted to keep multi-million-cue
+    corpora small; index is None for cues that are not numbered yet.
+    words: optional WordTimings when the model produced word timestamps.
+    """
+
+    __slots__ = ("index", "start", "end", "_text", "_chars", "words")
+
+    def __init__(self, index, start, end, text, words=None):
         self.index = index
         self.start = start
         self.end = end
         self.text = text
+        self.words = words
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+        self._chars = None  # derived from text, recomputed lazily
 
     @property
     def duration(self):
@@ -17,59 +112,274 @@ class Subtitle:
 
     @property
     def chars(self):
-        return len(re.sub(r"<[^>]+>", "", self.text))
+        if self._chars is None:
+            self._chars = len(TAG_RE.sub("", self._text))
+        return self._chars
 
     @property
     def lines(self):
-        return self.text.splitlines()
+        return self._text.splitlines()
+
+    def __repr__(self):
+        return f"Subtitle({self.index!r}, {self.start!r}, {self.end!r}, {self._text!r})"
+
 
+class SubtitleColumns:
+    """
+    Struct-of-arrays view of a cue list for the vectorized QC engine.
 
-def check_subtitles(subs: List[Subtitle], rules: Dict) -> List[dict]:
+    Per cue: index, start, end, chars (tags stripped), n_lines.
+    Per line (flattened): line_lengths and line_cue (position of the owning cue).
+    """
+
+    def __init__(self, index, start, end, chars, n_lines, line_lengths, line_cue):
+        self.index = np.asarray(index, dtype=np.int64)
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.chars = np.asarray(chars, dtype=np.int64)
+        self.n_lines = np.asarray(n_lines, dtype=np.int64)
+        self.line_lengths = np.asarray(line_lengths, dtype=np.int64)
+        self.line_cue = np.asarray(line_cue, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.start)
+
+    @cached_property
+    def duration(self) -> np.ndarray:
+        return self.end - self.start
+
+    @cached_property
+    def cps(self) -> np.ndarray:
+        """Characters per second; 999 for cues without a positive duration."""
+        positive = self.duration > 0
+        return np.where(positive, self.chars / np.where(positive, self.duration, 1.0), 999.0)
+
+    @classmethod
+    def from_subtitles(cls, subs: List[Subtitle]) -> "SubtitleColumns":
+        index, start, end, chars, n_lines = [], [], [], [], []
+        line_lengths, line_cue = [], []
+        for position, sub in enumerate(subs):
+            lines = sub.text.splitlines()
+            index.append(sub.index if sub.index is not None else position + 1)  # unnumbered: SRT order
+            start.append(sub.start)
+            end.append(sub.end)
+            chars.append(sub.chars)
+            n_lines.append(len(lines))
+            line_lengths.extend(len(line) for line in lines)
+            line_cue.extend([position] * len(lines))
+        return cls(index, start, end, chars, n_lines, line_lengths, line_cue)
+
+
+# ------------------ RULE REGISTRY ------------------
+#
+# A rule is registered as a factory: factory(profile) -> check or None.
+# The factory reads its thresholds from the profile once (None = rule not
+# enabled by this profile); check(cols, context) returns (counts, message):
+#   counts  - bool/int array, one entry per cue (int = issues for that cue)
+#   message - str, or callable(position) -> str
+# context carries optional extra inputs, e.g. {"shot_changes": [seconds, ...]}.
+# Issues of one cue come out in registration order.
+
+RULE_REGISTRY = {}  # rule name -> (factory, default severity)
+RULE_VERSIONS = {}  # rule name -> version, part of every profile hash
+_compiled_profiles = {}  # profile hash -> CompiledProfile
+
+
+def register_rule(name: str, severity: str = "ERROR", version: int = 1):
+    """
+    Decorator registering a rule factory under `name` (later registrations replace earlier ones).
+    Checks may only look at a cue and the cue before it (incremental QC re-checks no more).
+    Bump `version` when a rule's logic changes, so cached results (qc_index.py) are invalidated.
+    """
+    def decorator(factory):
+        RULE_REGISTRY[name] = (factory, severity)
+        RULE_VERSIONS[name] = version
+        _compiled_profiles.clear()
+        return factory
+    return decorator
+
+
+def profile_hash(rules: Dict) -> str:
+    """Hash of the profile plus the registered rules, so adding/changing a rule invalidates cached results."""
+    key = {"rules": rules, "registry": sorted(RULE_VERSIONS.items())}
+    return hashlib.blake2b(json.dumps(key, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+class CompiledProfile:
+    """A rules profile turned into [(name, severity, check)], built once per distinct profile."""
+
+    def __init__(self, rules: Dict):
+        self.name = rules.get("profile", "default")
+        self.hash = profile_hash(rules)
+        severities = rules.get("severity", {})
+        self.checks = []
+        for name, (factory, severity) in RULE_REGISTRY.items():
+            check = factory(rules)
+            if check is not None:
+                self.checks.append((name, severities.get(name, severity), check))
+
+    def run(self, cols: "SubtitleColumns", context: Dict = None) -> List[tuple]:
+        """(cue position, issue) pairs, in cue order."""
+        n = len(cols)
+        if n == 0 or not self.checks:
+            return []
+        context = context or {}
+        results = [check(cols, context) for _, _, check in self.checks]
+        counts = np.vstack([np.asarray(found, dtype=np.int64) for found, _ in results])
+
+        flagged = np.flatnonzero(counts.any(axis=0))
+        if not len(flagged):
+            return []
+        index = cols.index[flagged].tolist()
+        flagged_counts = counts[:, flagged].T.tolist()
+
+        issues = []
+        for k, position in enumerate(flagged.tolist()):
+            for (name, severity, _), (_, message), count in zip(self.checks, results, flagged_counts[k]):
+                for _ in range(count):
+                    text = message(position) if callable(message) else message
+                    issues.append((position, _issue(index[k], name, text, severity)))
+        return issues
+
+
+def compile_profile(rules: Dict) -> CompiledProfile:
+    """Compiled profile for `rules`, cached by profile hash."""
+    key = profile_hash(rules)
+    compiled = _compiled_profiles.get(key)
+    if compiled is None:
+        compiled = _compiled_profiles[key] = CompiledProfile(rules)
+    return compiled
+
+
+# ------------------ BUILT-IN RULES ------------------
+
+@register_rule("DURATION_TOO_SHORT")
+def _duration_too_short(rules):
+    limit = rules["timing"]["min_duration_sec"]
+    return lambda cols, context: (cols.duration < limit, "Subtitle too short")
+
+
+@register_rule("DURATION_TOO_LONG")
+def _duration_too_long(rules):
+    limit = rules["timing"]["max_duration_sec"]
+    return lambda cols, context: (cols.duration > limit, "Subtitle too long")
+
+
+@register_rule("CPS_TOO_HIGH")
+def _cps_too_high(rules):
+    limit = rules["reading_speed"]["max_cps"]
+
+    def check(cols, context):
+        cps = cols.cps
+        return cps > limit, lambda position: f"Reading speed {cps[position]:.1f} CPS exceeds limit"
+    return check
+
+
+@register_rule("TOO_MANY_LINES")
+def _too_many_lines(rules):
+    limit = rules["layout"]["max_lines"]
+    return lambda cols, context: (cols.n_lines > limit, "More than 2 lines")
+
+
+@register_rule("LINE_TOO_LONG")
+def _line_too_long(rules):
+    limit = rules["layout"]["max_chars_per_line"]
+
+    def check(cols, context):
+        return np.bincount(cols.line_cue[cols.line_lengths > limit], minlength=len(cols)), "Line exceeds max length"
+    return check
+
+
+@register_rule("GAP_TOO_SMALL")
+def _gap_too_small(rules):
+    limit = rules["timing"]["min_gap_sec"]
+
+    def check(cols, context):
+        gap_small = np.zeros(len(cols), dtype=bool)
+        gap_small[1:] = (cols.start[1:] - cols.end[:-1]) < limit
+        return gap_small, "Gap between subtitles too small"
+    return check
+
+
+# Opt-in rules: only active when the profile configures them.
+
+@register_rule("OVERLAPPING_CUES", version=2)
+def _overlapping_cues(rules):
+    if rules.get("timing", {}).get("allow_overlap", True):
+        return None
+
+    def check(cols, context):
+        overlap = np.zeros(len(cols), dtype=bool)
+        overlap[1:] = cols.start[1:] < cols.end[:-1]  # previous cue only, like GAP_TOO_SMALL
+        return overlap, "Subtitle overlaps the previous one"
+    return check
+
+
+@register_rule("SHOT_CHANGE_TOO_CLOSE", severity="WARNING")
+def _shot_change_too_close(rules):
+    settings = rules.get("shot_changes")
+    if not settings:
+        return None
+    min_distance = settings["min_distance_sec"]
+    snap_tolerance = settings.get("snap_tolerance_sec", 0.001)  # on the cut itself is fine
+
+    def near_cut(times, cuts):
+        right = np.clip(np.searchsorted(cuts, times), 0, len(cuts) - 1)
+        left = np.clip(right - 1, 0, len(cuts) - 1)
+        distance = np.minimum(np.abs(times - cuts[left]), np.abs(times - cuts[right]))
+        return (distance > snap_tolerance) & (distance < min_distance)
+
+    def check(cols, context):
+        cuts = np.sort(np.asarray(context.get("shot_changes", ()), dtype=np.float64))
+        if not len(cuts):
+            return np.zeros(len(cols), dtype=bool), ""
+        return near_cut(cols.start, cuts) | near_cut(cols.end, cuts), "Subtitle starts/ends just next to a shot change"
+    return check
+
+
+# ------------------ CHECKS ------------------
+
+def check_subtitles(subs: List[Subtitle], rules: Dict, context: Dict = None) -> List[dict]:
     """
     Returns a list of QC issues:
     [{ index, rule, message, severity }]
     """
-    issues = []
+    return check_columns(SubtitleColumns.from_subtitles(subs), rules, context)
 
-    for i, sub in enumerate(subs):
-        duration = sub.duration
 
-        # Duration
-        if duration < rules["timing"]["min_duration_sec"]:
-            issues.append(issue(sub, "DURATION_TOO_SHORT", "Subtitle too short"))
+def check_columns(cols: SubtitleColumns, rules: Dict, context: Dict = None) -> List[dict]:
+    """
+    Vectorized QC: every rule is a NumPy mask over all cues, Python only
+    touches the cues that have at least one issue.
+    Issues and their order are the same as the per-cue rule order
+    (duration, reading speed, layout, gap, then custom rules).
+    """
+    return [issue for _, issue in check_columns_by_position(cols, rules, context)]
 
-        if duration > rules["timing"]["max_duration_sec"]:
-            issues.append(issue(sub, "DURATION_TOO_LONG", "Subtitle too long"))
 
-        # Reading speed
-        cps = sub.chars / duration if duration > 0 else 999
-        if cps > rules["reading_speed"]["max_cps"]:
-            issues.append(issue(
-                sub,
-                "CPS_TOO_HIGH",
-                f"Reading speed {cps:.1f} CPS exceeds limit"
-            ))
+def check_columns_by_position(cols: SubtitleColumns, rules: Dict, context: Dict = None) -> List[tuple]:
+    """Same as check_columns, as (cue position, issue) pairs."""
+    return compile_profile(rules).run(cols, context)
 
-        # Layout
-        if len(sub.lines) > rules["layout"]["max_lines"]:
-            issues.append(issue(sub, "TOO_MANY_LINES", "More than 2 lines"))
 
-        for line in sub.lines:
-            if len(line) > rules["layout"]["max_chars_per_line"]:
-                issues.append(issue(sub, "LINE_TOO_LONG", "Line exceeds max length"))
+def check_profiles(cols: SubtitleColumns, profiles: List[Dict], context: Dict = None) -> Dict[str, List[dict]]:
+    """
+    Run several profiles over the same cues: {profile name: issues}.
+    Derived arrays (duration, CPS) are computed once and shared by all profiles.
+    """
+    return {
+        compiled.name: [issue for _, issue in compiled.run(cols, context)]
+        for compiled in (compile_profile(rules) for rules in profiles)
+    }
 
-        # Gap
-        if i > 0:
-            gap = sub.start - subs[i - 1].end
-            if gap < rules["timing"]["min_gap_sec"]:
-                issues.append(issue(sub, "GAP_TOO_SMALL", "Gap between subtitles too small"))
 
-    return issues
+def issue(sub, rule, message, severity="ERROR"):
+    return _issue(sub.index, rule, message, severity)
 
 
-def issue(sub, rule, message, severity="ERROR"):
+def _issue(index, rule, message, severity="ERROR"):
     return {
-        "index": sub.index,
+        "index": index,
         "rule": rule,
         "message": message,
         "severity": severity
@@ -0,0 +1,48 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("faster_whisper")  # database_api is stubbed in conftest.py
+
+from subtitles_cli import load_resegment_rules, write_segments_to_srt  # noqa: E402
+from srt_parser import iter_srt  # noqa: E402
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "files", "rules.json")
+
+
+def _long_segment(words: int = 25, start: float = 1.0, word_sec: float = 0.5):
+    """One 12.4 s model segment with word timestamps (a pause after every fifth word)."""
+    timed, position = [], start
+    for n in range(words):
+        timed.append(SimpleNamespace(word=f" word{n}", start=position, end=position + 0.4))
+        position += word_sec + (0.1 if n % 5 == 4 else 0.0)
+    end = timed[-1].end
+    text = "".join(word.word for word in timed)
+    return SimpleNamespace(start=start, end=end, text=text, words=timed)
+
+
+@pytest.mark.parametrize("rules_path", [None, RULES_PATH])
+def test_long_segment_is_split_not_dropped(tmp_path, rules_path):
+    segment = _long_segment()
+    assert segment.end - segment.start > 10.0
+    output = tmp_path / "out.srt"
+
+    count = write_segments_to_srt([segment], str(output), max_segment_duration=10.0,
+                                  rules=load_resegment_rules(rules_path))
+
+    cues = list(iter_srt(output))
+    assert count == len(cues) >= 2
+    assert all(cue.end - cue.start <= 10.0 for cue in cues)
+    assert " ".join(cue.text.replace("\n", " ") for cue in cues).split() == segment.text.split()
+
+
+def test_long_segment_without_word_timestamps_is_split(tmp_path):
+    segment = SimpleNamespace(start=0.0, end=25.0, text=" ".join(f"w{n}" for n in range(40)), words=None)
+    output = tmp_path / "out.srt"
+
+    write_segments_to_srt([segment], str(output), max_segment_duration=10.0)
+
+    cues = list(iter_srt(output))
+    assert all(cue.end - cue.start <= 10.0 for cue in cues)
+    assert " ".join(cue.text for cue in cues).split() == segment.text.split()
@@ -0,0 +1,241 @@
+# transcription_benchmark.py
+#
+# Reproducible throughput benchmark for the transcription path.
+#
+# Runs recordings of real speech through the production path (model_pool.get_model
+# + subtitles_cli.transcribe_to_srt_cuda, cache off) for each combination of
+# model x compute_type x cpu_threads x beam_size x vad_filter x batch_size and
+# reports real-time factor (RTF = transcription wall time / audio duration, lower
+# is faster), first-segment latency, the time of each pipeline stage (from
+# pipeline_metrics), model load time, peak RSS and CPU utilization.
+#
+# Without recordings (--audio or files in BENCHMARK_FIXTURES_FOLDER) a generated
+# speech-like signal is used so the benchmark runs with no setup; VAD, language
+# detection and decoding behave differently on it than on speech, so compare
+# configurations on real recordings.
+#
+# Each configuration runs in a fresh spawned process so peak RSS is per config
+# and no warm caches leak between runs.
+#
+#   python transcription_benchmark.py --audio ./benchmarks/fixtures/interview.wav \
+#       --models base small --compute-types float32 int8 --cpu-threads 4 8 --beam-sizes 1 5 --vad on off \
+#       --batch-sizes 0 8 --output bench.json
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from media_utils import WHISPER_SAMPLE_RATE, decode_audio
+from subtitles_cli import RESEGMENT_RULES_PATH
+
+BENCHMARK_FIXTURES_FOLDER = "./benchmarks/fixtures"
+FIXTURE_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a", ".ogg", ".mp4", ".mkv")
+SYNTHETIC_SECONDS = 60.0
+BENCHMARK_STAGES = ("transcribe_setup", "decoding", "postprocess", "srt_write")  # pipeline_metrics stages reported per run
+
+RESULT_FIELDS = [
+    "fixture", "audio_sec", "model", "compute_type", "cpu_threads", "beam_size", "vad_filter",
+    "batch_size", "load_sec", "first_segment_sec", "transcribe_sec", "rtf",
+    *(f"{name}_sec" for name in BENCHMARK_STAGES), "segments", "peak_rss_mb", "cpu_percent",
+]
+
+
+def synthetic_fixture(seconds: float = SYNTHETIC_SECONDS, seed: int = 0) -> np.ndarray:
+    """
+    Deterministic speech-like signal: voiced harmonic bursts (syllables) with
+    pitch drift, separated by short pauses and low background noise.
+    """
+    rng = np.random.default_rng(seed)
+    sr = WHISPER_SAMPLE_RATE
+    audio = np.zeros(int(seconds * sr), dtype=np.float32)
+    position = 0
+    while position < len(audio):
+        length = int(rng.uniform(0.12, 0.35) * sr)
+        t = np.arange(min(length, len(audio) - position)) / sr
+        pitch = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * 3 * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / sr
+        burst = sum(np.sin(k * phase) / k for k in range(1, 6))
+        envelope = np.sin(np.pi * t / t[-1]) if len(t) > 1 else 1.0
+        audio[position:position + len(t)] = 0.2 * burst * envelope
+        position += len(t) + int(rng.uniform(0.03, 0.6) * sr)
+    audio += 0.005 * rng.standard_normal(len(audio)).astype(np.float32)
+    return audio
+
+
+def list_fixtures(folder: str = BENCHMARK_FIXTURES_FOLDER) -> list:
+    """Speech recordings in the fixtures folder, or ["synthetic"] if the folder has none."""
+    if os.path.isdir(folder):
+        fixtures = sorted(
+            os.path.join(folder, f) for f in os.listdir(folder)
+            if f.lower().endswith(FIXTURE_EXTENSIONS)
+        )
+        if fixtures:
+            return fixtures
+    return ["synthetic"]
+
+
+def load_fixture(fixture: str) -> np.ndarray:
+    return synthetic_fixture() if fixture == "synthetic" else decode_audio(fixture)
+
+
+def _read_stage_metrics(metrics_path: str) -> tuple:
+    """
+    ({"<stage>_sec": wall seconds} for BENCHMARK_STAGES, time the first segment was decoded or None)
+    from a pipeline_metrics JSON lines file.
+    """
+    seconds = dict.fromkeys(BENCHMARK_STAGES, 0.0)
+    first_segment_ts = None
+    if os.path.isfile(metrics_path):
+        with open(metrics_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["stage"] in seconds:
+                    seconds[entry["stage"]] += entry["wall_sec"]
+                if entry["stage"] == "decoding":
+                    first_segment_ts = entry.get("first_item_ts")
+    return {f"{name}_sec": round(value, 3) for name, value in seconds.items()}, first_segment_ts
+
+
+def _run_config(fixture: str, config: dict, language: str, device: str, rules_path: str) -> dict:
+    """Runs in a fresh process: decode the fixture, load the model through the pool, transcribe once, measure."""
+    import pipeline_metrics
+    from model_pool import get_model
+    from subtitles_cli import transcribe_to_srt_cuda
+
+    audio = load_fixture(fixture)  # decoded up front, ffmpeg time is not part of the RTF
+    audio_sec = len(audio) / WHISPER_SAMPLE_RATE
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as work:
+        load_start = time.perf_counter()
+        # Same pool key transcribe_to_srt_cuda uses, so the run below gets this warm model
+        get_model(config["model"], device=device, compute_type=config["compute_type"],
+                  cpu_threads=config["cpu_threads"])
+        load_sec = time.perf_counter() - load_start
+
+        metrics_path = os.path.join(work, "metrics.jsonl")
+        pipeline_metrics.enable(metrics_path)
+        output_srt = os.path.join(work, "bench.srt")
+        cpu_start = time.process_time()
+        start_ts = time.time()
+        start = time.perf_counter()
+        transcribe_to_srt_cuda(
+            audio,
+            model_path=config["model"],
+            output_srt=output_srt,
+            language=language,
+            device=device,
+            compute_type=config["compute_type"],
+            cpu_threads=config["cpu_threads"],
+            use_cache=False,
+            batch_size=config["batch_size"],
+            rules_path=rules_path,
+            beam_size=config["beam_size"],
+            vad_filter=config["vad_filter"],
+        )
+        transcribe_sec = time.perf_counter() - start
+        cpu_sec = time.process_time() - cpu_start
+        pipeline_metrics.disable()
+
+        stages, first_segment_ts = _read_stage_metrics(metrics_path)
+        with open(output_srt, "r", encoding="utf-8") as f:
+            segments = sum(1 for line in f if "-->" in line)
+
+    return {
+        "fixture": os.path.basename(fixture),
+        "audio_sec": round(audio_sec, 2),
+        **config,
+        "load_sec": round(load_sec, 3),
+        "first_segment_sec": round(first_segment_ts - start_ts, 3) if first_segment_ts is not None else None,
+        "transcribe_sec": round(transcribe_sec, 3),
+        "rtf": round(transcribe_sec / audio_sec, 4) if audio_sec else None,
+        **stages,
+        "segments": segments,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "cpu_percent": round(100 * cpu_sec / transcribe_sec, 1) if transcribe_sec else None,
+    }
+
+
+def sweep(models, compute_types, cpu_threads, beam_sizes, vad_filters, batch_sizes) -> list:
+    keys = ["model", "compute_type", "cpu_threads", "beam_size", "vad_filter", "batch_size"]
+    return [
+        dict(zip(keys, values))
+        for values in itertools.product(models, compute_types, cpu_threads, beam_sizes, vad_filters, batch_sizes)
+    ]
+
+
+def run_benchmark(fixtures: list, configs: list, language: str = None, repeat: int = 1, device: str = "cpu",
+                  rules_path: str = RESEGMENT_RULES_PATH) -> list:
+    results = []
+    total = len(fixtures) * len(configs) * repeat
+    done = 0
+    for fixture in fixtures:
+        for config in configs:
+            for _ in range(repeat):
+                done += 1
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    result = pool.submit(_run_config, fixture, config, language, device, rules_path).result()
+                results.append(result)
+                print(f"⏱️ [{done}/{total}] {result['fixture']} {config} -> RTF {result['rtf']} "
+                      f"| first segment {result['first_segment_sec']}s | {result['peak_rss_mb']} MB")
+    return results
+
+
+def write_results(results: list, output_path: str):
+    if output_path.lower().endswith(".csv"):
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+def _on_off(value: str):
+    """on/off; "default" (None) keeps faster-whisper's default for the decoding path."""
+    if value.lower() == "default":
+        return None
+    return value.lower() in ("on", "true", "1", "yes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark transcription throughput across configurations.")
+    parser.add_argument("--audio", nargs="*", default=None,
+                        help=f"speech recordings to transcribe (default: {BENCHMARK_FIXTURES_FOLDER} "
+                             f"or a generated fixture)")
+    parser.add_argument("--models", nargs="+", default=["base"])
+    parser.add_argument("--compute-types", nargs="+", default=["float32", "int8"])
+    parser.add_argument("--cpu-threads", nargs="+", type=int, default=[os.cpu_count() or 1])
+    parser.add_argument("--beam-sizes", nargs="+", type=int, default=[5])
+    parser.add_argument("--vad", nargs="+", type=_on_off, default=[None],
+                        help="on/off/default: VAD filter of the decode (default: on when batched, else off)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[0], help="0 = sequential model.transcribe")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--rules", default=RESEGMENT_RULES_PATH,
+                        help="QC profile for re-segmenting, 'none' = legacy split")
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json", help=".json or .csv")
+    args = parser.parse_args(argv)
+
+    fixtures = args.audio or list_fixtures()
+    if fixtures == ["synthetic"]:
+        print(f"⚠️ No recordings in {BENCHMARK_FIXTURES_FOLDER}, using a generated speech-like fixture")
+    rules_path = None if args.rules.lower() == "none" else args.rules
+    configs = sweep(args.models, args.compute_types, args.cpu_threads, args.beam_sizes, args.vad, args.batch_sizes)
+    results = run_benchmark(fixtures, configs, args.language, args.repeat, args.device, rules_path)
+    write_results(results, args.output)
+    print(f"\n📊 {len(results)} runs written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
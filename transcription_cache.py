@@ -0,0 +1,173 @@
+# transcription_cache.py
+#
+# Persistent SRT cache keyed by media content x transcription parameters.
+# Entries are plain files: <CACHE_FOLDER>/<fingerprint>_<params hash>.srt
+# so a media file can be invalidated for every parameter set at once.
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CACHE_FOLDER = os.environ.get("TRANSCRIPTION_CACHE_FOLDER", "./cache/transcriptions")
+DEFAULT_MAX_MB = int(os.environ.get("TRANSCRIPTION_CACHE_MAX_MB", "1024"))
+HASH_CHUNK_BYTES = 1 << 22  # read size while hashing a media file
+
+_file_fingerprints = {}  # (abspath, size, mtime_ns) -> fingerprint, so a file is hashed once per process
+
+
+def fingerprint_file(path: str) -> str:
+    """
+    Content fingerprint: blake2b of the whole file (~1 GB/s, small next to a transcription).
+    Survives renames, copies and the timestamped names extract_audio produces; any
+    edit changes it, wherever it lands in the file.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    cached = _file_fingerprints.get(memo_key)
+    if cached is not None:
+        return cached
+    digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    _file_fingerprints[memo_key] = digest.hexdigest()
+    return _file_fingerprints[memo_key]
+
+
+def fingerprint_audio(audio: np.ndarray) -> str:
+    """Fingerprint of an already decoded audio array (full hash, blake2b is ~1 GB/s)."""
+    audio = np.ascontiguousarray(audio)
+    digest = hashlib.blake2b(str(audio.shape).encode(), digest_size=16)
+    digest.update(memoryview(audio).cast("B"))
+    return digest.hexdigest()
+
+
+def fingerprint(source) -> str:
+    if isinstance(source, str):
+        return fingerprint_file(source)
+    return fingerprint_audio(source)
+
+
+def make_key(source_fingerprint: str, **params) -> str:
+    """Cache key for one media fingerprint and a set of transcription params."""
+    params_hash = hashlib.blake2b(
+        json.dumps(params, sort_keys=True, default=str).encode(),
+        digest_size=8
+    ).hexdigest()
+    return f"{source_fingerprint}_{params_hash}"
+
+
+def _remove(path: str) -> int:
+    # Batch workers share the folder, another process may have evicted it already.
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+class TranscriptionCache:
+    """Directory of cached SRT files with size-based LRU eviction (by mtime)."""
+
+    def __init__(self, folder: str = CACHE_FOLDER, max_mb: float = DEFAULT_MAX_MB):
+        self.folder = folder
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, key + ".srt")
+
+    def get(self, key: str):
+        """Return cached SRT text, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mark as recently used
+        return content
+
+    def put(self, key: str, srt_content: str):
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(srt_content)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def put_file(self, key: str, srt_path: str):
+        with open(srt_path, "r", encoding="utf-8") as f:
+            self.put(key, f.read())
+
+    def _entries(self) -> list:
+        if not os.path.isdir(self.folder):
+            return []
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.name.endswith(".srt"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+
+    def invalidate(self, source_fingerprint: str = None) -> int:
+        """Remove entries of one media fingerprint (all params), or everything if None."""
+        removed = 0
+        for _, _, path in self._entries():
+            if source_fingerprint is None or os.path.basename(path).startswith(source_fingerprint + "_"):
+                removed += _remove(path)
+        return removed
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "folder": self.folder,
+            "entries": len(entries),
+            "size_mb": round(sum(size for _, size, _ in entries) / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+        }
+
+
+# ------------------ MODULE-LEVEL CACHE ------------------
+
+_cache = TranscriptionCache()
+
+
+def get_cache() -> TranscriptionCache:
+    return _cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the transcription cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="show cache size")
+    subparsers.add_parser("clear", help="remove every cached transcription")
+    invalidate_parser = subparsers.add_parser("invalidate", help="remove cached transcriptions of media files")
+    invalidate_parser.add_argument("media", nargs="+")
+    args = parser.parse_args(argv)
+
+    cache = get_cache()
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.command == "clear":
+        print(f"🗑️ Removed {cache.invalidate()} cached transcriptions")
+    else:
+        for media_path in args.media:
+            removed = cache.invalidate(fingerprint_file(media_path))
+            print(f"🗑️ {media_path}: removed {removed} cached transcriptions")
+
+
+if __name__ == "__main__":
+    main()
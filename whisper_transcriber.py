@@ -19,6 +19,7 @@ from faster_whisper import WhisperModel
 # Transcription took 236.25s
 
 # can be 7x slower - Transcription took 1507.76s
+# reproducible numbers across configs: python transcription_benchmark.py --help
 model = WhisperModel("base", device="cpu", compute_type="float32")
 
 segments, _ = model.transcribe("china_podcast.mp3", language="pt", task="transcribe", vad_filter=True, word_timestamps=False)